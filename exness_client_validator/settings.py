@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -36,6 +37,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'validator_app.middleware.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,6 +56,8 @@ if not DEBUG:
     SECURE_HSTS_PRELOAD = True
     CSRF_COOKIE_DOMAIN = '.tegotrend.com'
     CSRF_TRUSTED_ORIGINS = ['https://check-exness.tegotrend.com']
+    # Load balancer probes talk plain HTTP to the instance
+    SECURE_REDIRECT_EXEMPT = [r'^healthz/$', r'^readyz/$']
 
 ROOT_URLCONF = 'exness_client_validator.urls'
 
@@ -79,16 +83,37 @@ WSGI_APPLICATION = 'exness_client_validator.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 # Use PostgreSQL in production, SQLite in development
+SQLITE_PATH = os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
 if os.getenv('DATABASE_URL'):
     import dj_database_url
     DATABASES = {
-        'default': dj_database_url.config(conn_max_age=600)
+        'default': dj_database_url.config(conn_max_age=int(os.getenv('DATABASE_CONN_MAX_AGE', '600')))
+    }
+    # Set directly rather than as config() kwargs, which older dj-database-url releases lack
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    # PgBouncer in transaction pooling mode can't keep server-side cursors open
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = os.getenv('DATABASE_POOLER', 'False') == 'True'
+elif os.getenv('SQLITE_HIGH_CONCURRENCY', 'False') == 'True':
+    # WAL journaling plus IMMEDIATE write transactions for several gunicorn workers
+    DATABASES = {
+        'default': {
+            'ENGINE': 'validator_app.sqlite_backend',
+            'NAME': SQLITE_PATH,
+            'OPTIONS': {
+                'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'NAME': SQLITE_PATH,
         }
     }
 
@@ -123,7 +148,38 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# Hashed, pre-compressed static files (gzip, plus brotli when installed);
+# WhiteNoise serves the hashed names with far-future immutable cache headers
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+WHITENOISE_MAX_AGE = int(os.getenv('WHITENOISE_MAX_AGE', '86400'))
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Holds the rendered static fragments of validator.html and the throttling counters.
+# Set REDIS_URL to share the counters between workers and instances.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'exness-client-validator',
+        }
+    }
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -138,6 +194,80 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 EXNESS_API_EMAIL = os.getenv('EXNESS_API_EMAIL')
 EXNESS_API_PASSWORD = os.getenv('EXNESS_API_PASSWORD')
 
+# Several affiliate accounts to spread lookups across, as a JSON list of
+# {"email": ..., "password": ...} objects; falls back to the single account above
+EXNESS_API_ACCOUNTS = json.loads(os.getenv('EXNESS_API_ACCOUNTS') or '[]')
+EXNESS_ACCOUNT_STRATEGY = os.getenv('EXNESS_ACCOUNT_STRATEGY', 'least_loaded')  # or 'round_robin'
+EXNESS_ACCOUNT_EJECT_SECONDS = int(os.getenv('EXNESS_ACCOUNT_EJECT_SECONDS', '300'))
+EXNESS_ACCOUNT_MAX_FAILURES = int(os.getenv('EXNESS_ACCOUNT_MAX_FAILURES', '3'))
+EXNESS_API_TIMEOUT = float(os.getenv('EXNESS_API_TIMEOUT', '30'))
+
+# Hedged V1/V2 client lookups: 'off' (sequential fallback), 'delayed' or 'parallel'
+EXNESS_HEDGE_MODE = os.getenv('EXNESS_HEDGE_MODE', 'off')
+EXNESS_HEDGE_DELAY_MS = int(os.getenv('EXNESS_HEDGE_DELAY_MS', '300'))
+EXNESS_HEDGE_MAX_WORKERS = int(os.getenv('EXNESS_HEDGE_MAX_WORKERS', '8'))
+EXNESS_HEDGE_ATTEMPT_TIMEOUT = float(os.getenv('EXNESS_HEDGE_ATTEMPT_TIMEOUT', '10'))  # read timeout per hedged request
+
+# Micro-batching: lookups by account number arriving within this many ms share one
+# multi-value /reports/clients/ query (0 disables)
+EXNESS_BATCH_WINDOW_MS = int(os.getenv('EXNESS_BATCH_WINDOW_MS', '0'))
+EXNESS_BATCH_MAX_SIZE = int(os.getenv('EXNESS_BATCH_MAX_SIZE', '20'))
+EXNESS_BATCH_FILTER_STYLE = os.getenv('EXNESS_BATCH_FILTER_STYLE', 'csv')  # 'csv' or 'repeat'
+EXNESS_BATCH_WAIT = float(os.getenv('EXNESS_BATCH_WAIT', '90'))  # seconds a caller waits for its batch
+# Whether an account missing from a batch reply is 'not registered': 'auto' (once a reply
+# has shown the filter works), 'always' or 'never' (re-check each one individually)
+EXNESS_BATCH_TRUST_MISSING = os.getenv('EXNESS_BATCH_TRUST_MISSING', 'auto')
+EXNESS_BATCH_FALLBACK_WORKERS = int(os.getenv('EXNESS_BATCH_FALLBACK_WORKERS', '4'))  # concurrent re-checks
+
+# Memory cap for bodies kept to answer 304 Not Modified responses, per worker
+EXNESS_CONDITIONAL_CACHE_BYTES = int(os.getenv('EXNESS_CONDITIONAL_CACHE_MB', '32')) * 1024 * 1024
+
+# Seconds a positive lookup result is reused without calling the API (off by default)
+EXNESS_RESULT_CACHE_TTL = int(os.getenv('EXNESS_RESULT_CACHE_TTL', '0'))
+
+# Encrypted warm-start snapshot of token, cookies and cached results (disabled when unset)
+EXNESS_SNAPSHOT_PATH = os.getenv('EXNESS_SNAPSHOT_PATH')
+EXNESS_SNAPSHOT_INTERVAL = int(os.getenv('EXNESS_SNAPSHOT_INTERVAL', '60'))
+EXNESS_SNAPSHOT_KEY = os.getenv('EXNESS_SNAPSHOT_KEY')
+
+# Background revalidation of stored registered clients (manage.py revalidate_clients)
+EXNESS_REVALIDATE_BUDGET = int(os.getenv('EXNESS_REVALIDATE_BUDGET', '50'))  # upstream calls per batch
+EXNESS_REVALIDATE_RATE = float(os.getenv('EXNESS_REVALIDATE_RATE', '1'))  # upstream calls per second
+EXNESS_REVALIDATE_INTERVAL = int(os.getenv('EXNESS_REVALIDATE_INTERVAL', '300'))  # seconds between batches
+EXNESS_REVALIDATE_HOT_WINDOW = int(os.getenv('EXNESS_REVALIDATE_HOT_WINDOW', str(7 * 24 * 3600)))
+EXNESS_REVALIDATE_HOT_INTERVAL = int(os.getenv('EXNESS_REVALIDATE_HOT_INTERVAL', '3600'))
+EXNESS_REVALIDATE_COLD_INTERVAL = int(os.getenv('EXNESS_REVALIDATE_COLD_INTERVAL', str(24 * 3600)))
+
+# Admission control on the validator form, as '<count>/<s|m|h|d>' (empty disables a limit)
+THROTTLE_IP_RATE = os.getenv('THROTTLE_IP_RATE', '20/m')
+THROTTLE_SESSION_RATE = os.getenv('THROTTLE_SESSION_RATE', '10/m')
+UPSTREAM_BUDGET = os.getenv('UPSTREAM_BUDGET', '120/m')  # upstream lookups across all visitors
+THROTTLE_CACHE_ALIAS = os.getenv('THROTTLE_CACHE_ALIAS', 'default')
+THROTTLE_TRUSTED_PROXIES = int(os.getenv('THROTTLE_TRUSTED_PROXIES', '0'))  # proxies setting X-Forwarded-For
+THROTTLE_CLIENT_IP_HEADER = os.getenv('THROTTLE_CLIENT_IP_HEADER', '')  # e.g. 'DO-Connecting-IP' behind App Platform
+
+# Health checks: /healthz/ only says the process is up; /readyz/ also needs the
+# database and (unless disabled) a valid affiliate token in this worker
+HEALTH_REQUIRE_TOKEN = os.getenv('HEALTH_REQUIRE_TOKEN', 'True') == 'True'
+EXNESS_WARM_TOKENS = os.getenv('EXNESS_WARM_TOKENS', 'True') == 'True'  # log in at worker boot
+EXNESS_WARMUP_RETRY = int(os.getenv('EXNESS_WARMUP_RETRY', '30'))  # longest backoff between warm-up attempts while cold
+
+# Asynchronous validation jobs: the page POSTs, gets a job ID back and polls for the result
+VALIDATION_JOBS = os.getenv('VALIDATION_JOBS', 'False') == 'True'
+VALIDATION_JOB_WORKERS = int(os.getenv('VALIDATION_JOB_WORKERS', '8'))  # worker threads per process
+VALIDATION_JOB_TIMEOUT = int(os.getenv('VALIDATION_JOB_TIMEOUT', '120'))  # seconds before a job counts as lost
+VALIDATION_JOB_RETENTION = int(os.getenv('VALIDATION_JOB_RETENTION', '86400'))
+
+# MT4/5 account numbers accepted by the validator form
+CLIENT_ID_PATTERN = os.getenv('CLIENT_ID_PATTERN', r'^\d{5,12}$')
+
+# Per-request profiling: sample a fraction of requests, or profile requests sending
+# an X-Profile header equal to PROFILING_SECRET. Disabled when both are unset.
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SECRET = os.getenv('PROFILING_SECRET')
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', '200'))
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
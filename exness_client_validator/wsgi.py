@@ -13,4 +13,16 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exness_client_validator.settings')
 
-application = get_wsgi_application() 
\ No newline at end of file
+application = get_wsgi_application()
+
+# Restore the warm-start snapshot in each worker (no-op unless EXNESS_SNAPSHOT_PATH is set)
+from validator_app.snapshot import start_snapshots  # noqa: E402
+
+start_snapshots()
+
+# Log in any account the snapshot didn't cover, so /readyz/ passes before real traffic arrives
+from django.conf import settings  # noqa: E402
+from validator_app.health import start_token_warmup  # noqa: E402
+
+if settings.EXNESS_WARM_TOKENS:
+    start_token_warmup()
@@ -0,0 +1,150 @@
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class AffiliateAccount:
+    """One set of affiliate credentials with its own token, cookies and health state"""
+    
+    def __init__(self, email, password, token_cache=None):
+        self.email = email
+        self.password = password
+        # Same shape as ExnessApiClient.TOKEN_CACHE
+        self.token_cache = token_cache if token_cache is not None else {
+            'token': None,
+            'expires_at': None,
+            'cookies': None
+        }
+        self.auth_lock = threading.Lock()
+        self.in_flight = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.last_error = None
+    
+    @property
+    def label(self):
+        """Email with the local part masked, safe to log"""
+        local, _, domain = (self.email or '').partition('@')
+        return f"{local[:2]}***@{domain}" if domain else '***'
+    
+    def is_healthy(self, now=None):
+        return self.ejected_until <= (now if now is not None else time.time())
+    
+    def __repr__(self):
+        return f"<AffiliateAccount {self.label}>"
+
+
+class AccountPool:
+    """
+    Spread upstream lookups across several affiliate accounts.
+    
+    Accounts are picked least-loaded first (fewest lookups in flight) or in
+    round-robin order. An account that is throttled, fails to authenticate or
+    keeps erroring is ejected for a cooldown period; while every account is
+    ejected, the one due back soonest is still used so lookups keep probing.
+    """
+    
+    STRATEGIES = ('least_loaded', 'round_robin')
+    
+    def __init__(self, accounts, strategy='least_loaded', eject_seconds=300, max_failures=3):
+        if not accounts:
+            raise ValueError("AccountPool needs at least one account")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown account strategy '{strategy}', expected one of: {', '.join(self.STRATEGIES)}")
+        
+        self.accounts = list(accounts)
+        self.strategy = strategy
+        self.eject_seconds = eject_seconds
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+        self._order = itertools.cycle(range(len(self.accounts)))
+    
+    @property
+    def primary(self):
+        return self.accounts[0]
+    
+    def acquire(self):
+        """Pick an account for one lookup and count it as in flight"""
+        now = time.time()
+        with self._lock:
+            healthy = [account for account in self.accounts if account.is_healthy(now)]
+            
+            if not healthy:
+                account = min(self.accounts, key=lambda a: a.ejected_until)
+            elif self.strategy == 'round_robin':
+                account = None
+                while account is None:
+                    candidate = self.accounts[next(self._order)]
+                    if candidate.is_healthy(now):
+                        account = candidate
+            else:
+                # Least loaded; rotate the starting point so ties are spread evenly
+                start = next(self._order)
+                ordered = self.accounts[start:] + self.accounts[:start]
+                account = min((a for a in ordered if a.is_healthy(now)), key=lambda a: a.in_flight)
+            
+            account.in_flight += 1
+            return account
+    
+    def release(self, account):
+        with self._lock:
+            account.in_flight -= 1
+    
+    @contextmanager
+    def lease(self):
+        """Context manager around acquire() and release()"""
+        account = self.acquire()
+        try:
+            yield account
+        finally:
+            self.release(account)
+    
+    def eject(self, account, reason, seconds=None):
+        """Take an account out of rotation for `seconds` (default eject_seconds)"""
+        seconds = self.eject_seconds if seconds is None else seconds
+        with self._lock:
+            account.ejected_until = time.time() + seconds
+            account.failures = 0
+            account.last_error = reason
+        logger.warning(f"Ejected affiliate account {account.label} for {seconds}s: {reason}")
+    
+    def restore(self, account):
+        """Put an ejected account straight back into rotation"""
+        with self._lock:
+            account.ejected_until = 0.0
+            account.failures = 0
+            account.last_error = None
+        logger.info(f"Affiliate account {account.label} is back in rotation")
+    
+    def record_success(self, account):
+        with self._lock:
+            account.failures = 0
+    
+    def record_failure(self, account, reason):
+        """Count an upstream error and eject the account after max_failures in a row"""
+        with self._lock:
+            account.failures += 1
+            account.last_error = reason
+            failures = account.failures
+        if failures >= self.max_failures:
+            self.eject(account, f"{failures} consecutive failures, last: {reason}")
+    
+    def stats(self):
+        """Per-account load and health, safe to expose (no credentials)"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    'account': account.label,
+                    'healthy': account.is_healthy(now),
+                    'in_flight': account.in_flight,
+                    'failures': account.failures,
+                    'ejected_for': max(0, round(account.ejected_until - now)),
+                    'last_error': account.last_error,
+                }
+                for account in self.accounts
+            ]
@@ -1,9 +1,16 @@
 from django.contrib import admin
-from .models import ClientValidation
+from .models import ClientValidation, ValidationJob
 
 @admin.register(ClientValidation)
 class ClientValidationAdmin(admin.ModelAdmin):
     list_display = ('client_id', 'is_registered', 'client_account', 'client_account_type', 'volume_lots', 'reward_usd', 'created_at')
     list_filter = ('is_registered', 'client_account_type')
     search_fields = ('client_id', 'client_account')
-    readonly_fields = ('created_at',) 
\ No newline at end of file
+    readonly_fields = ('created_at',) 
+
+@admin.register(ValidationJob)
+class ValidationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'client_id', 'email', 'status', 'is_registered', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('client_id', 'email')
+    readonly_fields = ('created_at', 'finished_at')
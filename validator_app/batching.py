@@ -0,0 +1,76 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collect lookups that arrive within a short window and resolve them together.
+    
+    The first key submitted into an empty batch starts a timer of `window`
+    seconds; when it fires (or as soon as `max_size` distinct keys are
+    pending) the whole batch goes to `resolve(keys) -> {key: result}` in one
+    call. Callers get a Future each; duplicate keys in the same window share
+    one Future.
+    """
+    
+    def __init__(self, resolve, window, max_size):
+        self.resolve = resolve
+        self.window = window
+        self.max_size = max(1, max_size)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+    
+    def submit(self, key):
+        """Queue `key` for the next batch and return the Future for its result"""
+        batch = None
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+            
+            if len(self._pending) >= self.max_size:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        
+        # A full batch is resolved on the thread that filled it
+        if batch:
+            self._run(batch)
+        return future
+    
+    def flush(self):
+        """Resolve whatever is pending now"""
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._run(batch)
+    
+    def _take(self):
+        batch = self._pending
+        self._pending = {}
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+    
+    def _run(self, batch):
+        try:
+            results = self.resolve(list(batch))
+        except Exception as e:
+            logger.exception(f"Batch of {len(batch)} lookups failed")
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        
+        for key, future in batch.items():
+            if key in results:
+                future.set_result(results[key])
+            else:
+                future.set_exception(LookupError(f"No result for {key}"))
@@ -0,0 +1,141 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import ClientValidation
+
+# Columns written by every export format, in order
+EXPORT_FIELDS = (
+    'id',
+    'client_id',
+    'is_registered',
+    'reg_date',
+    'client_account',
+    'client_account_type',
+    'volume_lots',
+    'volume_mln_usd',
+    'reward',
+    'reward_usd',
+    'created_at',
+    'last_checked_at',
+)
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# Rows fetched per database round-trip and joined into each streamed chunk
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller"""
+    
+    def write(self, value):
+        return value
+
+
+def _parse_day(value, name):
+    """Parse a YYYY-MM-DD filter value into an aware datetime at midnight"""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError(f"Invalid {name} date '{value}', expected YYYY-MM-DD")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _parse_bool(value, name):
+    """Parse a true/false filter value"""
+    lowered = str(value).strip().lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Invalid {name} value '{value}', expected true or false")
+
+
+def filter_validations(since=None, until=None, is_registered=None, client_account_type=None):
+    """
+    Build the export queryset from raw filter values.
+    
+    Args:
+        since (str): Only rows created on or after this YYYY-MM-DD date
+        until (str): Only rows created on or before this YYYY-MM-DD date
+        is_registered (str): 'true' or 'false'
+        client_account_type (str): Exact account type, e.g. 'Standard'
+        
+    Returns:
+        QuerySet: ClientValidation rows ordered by primary key
+        
+    Raises:
+        ValueError: If a filter value cannot be parsed
+    """
+    queryset = ClientValidation.objects.order_by('pk')
+    
+    if since:
+        queryset = queryset.filter(created_at__gte=_parse_day(since, 'since'))
+    if until:
+        # Compare against the next midnight rather than applying a __date transform per row
+        queryset = queryset.filter(created_at__lt=_parse_day(until, 'until') + timedelta(days=1))
+    if is_registered not in (None, ''):
+        queryset = queryset.filter(is_registered=_parse_bool(is_registered, 'is_registered'))
+    if client_account_type:
+        queryset = queryset.filter(client_account_type=client_account_type)
+    
+    return queryset
+
+
+def _iter_rows(queryset):
+    """
+    Stream raw value tuples one primary-key page at a time.
+    
+    Each page is its own bounded query (pk > last seen pk, LIMIT
+    EXPORT_CHUNK_SIZE) rather than one cursor over the whole export: with
+    DATABASE_POOLER on, server-side cursors are disabled and psycopg2 would
+    otherwise buffer the full result set in memory.
+    """
+    rows = queryset.order_by('pk').values_list(*EXPORT_FIELDS)
+    last_pk = None
+    while True:
+        page = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        page = list(page[:EXPORT_CHUNK_SIZE])
+        yield from page
+        if len(page) < EXPORT_CHUNK_SIZE:
+            return
+        # EXPORT_FIELDS starts with 'id'
+        last_pk = page[-1][0]
+
+
+def _batched(lines):
+    """Join lines into chunks of EXPORT_CHUNK_SIZE to keep per-yield overhead low"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def iter_csv(queryset):
+    """Yield the queryset as CSV text chunks, header first"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    yield from _batched(writer.writerow(row) for row in _iter_rows(queryset))
+
+
+def iter_jsonl(queryset):
+    """Yield the queryset as JSON Lines text chunks, one object per row"""
+    dumps = json.JSONEncoder(default=str, separators=(',', ':')).encode
+    yield from _batched(dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in _iter_rows(queryset))
+
+
+def iter_export(queryset, export_format):
+    """Yield text chunks of the queryset in the requested format"""
+    if export_format == 'csv':
+        return iter_csv(queryset)
+    if export_format == 'jsonl':
+        return iter_jsonl(queryset)
+    raise ValueError(f"Unsupported export format '{export_format}', expected one of: {', '.join(EXPORT_FORMATS)}")
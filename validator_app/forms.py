@@ -1,4 +1,6 @@
+import re
 from django import forms
+from django.conf import settings
 
 class ClientValidationForm(forms.Form):
     client_id = forms.CharField(
@@ -19,6 +21,17 @@ class ClientValidationForm(forms.Form):
         })
     )
     
+    def clean_client_id(self):
+        # Drop spaces and dashes people paste in, then check the account number format locally
+        client_id = re.sub(r'[\s-]+', '', self.cleaned_data.get('client_id') or '')
+        if client_id and not re.match(settings.CLIENT_ID_PATTERN, client_id):
+            raise forms.ValidationError("Please enter a valid MT4/5 account number (digits only)")
+        return client_id
+    
+    def clean_email(self):
+        # Normalize so the same address always maps to the same lookup
+        return (self.cleaned_data.get('email') or '').strip().lower()
+    
     def clean(self):
         cleaned_data = super().clean()
         client_id = cleaned_data.get('client_id')
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+from .services import ExnessApiClient
+
+logger = logging.getLogger(__name__)
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+_last_warmup = 0.0
+_warmup_failures = 0
+
+# Cold workers retry after 5s, 10s, 20s, ... up to EXNESS_WARMUP_RETRY
+WARMUP_MIN_RETRY = 5
+
+
+def start_token_warmup():
+    """
+    Log in the affiliate accounts in a background thread.
+    
+    Called at worker boot and again by the readiness check while the worker is
+    cold, backing off exponentially between failed attempts up to
+    EXNESS_WARMUP_RETRY seconds.
+    """
+    global _warmup_thread, _last_warmup
+    
+    with _warmup_lock:
+        if _warmup_thread is not None and _warmup_thread.is_alive():
+            return
+        backoff = min(settings.EXNESS_WARMUP_RETRY, WARMUP_MIN_RETRY * 2 ** _warmup_failures)
+        if _last_warmup and time.monotonic() - _last_warmup < backoff:
+            return
+        _last_warmup = time.monotonic()
+        _warmup_thread = threading.Thread(target=_warm_tokens, name='exness-warmup', daemon=True)
+        _warmup_thread.start()
+
+
+def _warm_tokens():
+    global _warmup_failures
+    
+    try:
+        warm = ExnessApiClient.warm_tokens()
+        logger.info(f"Token warm-up finished: {warm} account(s) hold a valid token")
+    except Exception:
+        logger.exception("Token warm-up failed")
+        warm = 0
+    _warmup_failures = 0 if warm else min(_warmup_failures + 1, 10)
+
+
+def check_database():
+    """Run a trivial query; returns (ok, error)"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        return True, None
+    except Exception as e:
+        return False, str(e)
+
+
+def upstream_state(accounts):
+    """Circuit state across all accounts: closed (all usable), partial, or open (all ejected)"""
+    healthy = sum(1 for account in accounts if account['healthy'])
+    if healthy == len(accounts):
+        return 'closed'
+    return 'open' if healthy == 0 else 'partial'
+
+
+def readiness(detailed=False):
+    """
+    Whether this worker should receive traffic, with the details behind it.
+    
+    Ready once the database answers and at least one account holds a valid
+    token (unless HEALTH_REQUIRE_TOKEN is off). The upstream circuit state is
+    reported but doesn't gate readiness: an outage at Exness affects every
+    instance alike, so pulling them all out of rotation wouldn't help.
+    
+    The endpoint is public, so by default the report only carries status,
+    token ages and circuit state. `detailed` (for staff) adds the database
+    error, per-account load and last errors, and the transfer counters.
+    """
+    database_ok, database_error = check_database()
+    
+    pool = ExnessApiClient.account_pool()
+    accounts = pool.stats()
+    for account, stats in zip(pool.accounts, accounts):
+        stats['token_age'] = ExnessApiClient.token_age(account)
+    warm = sum(1 for stats in accounts if stats['token_age'] is not None)
+    
+    if not warm:
+        start_token_warmup()
+    
+    ready = database_ok and (warm > 0 or not settings.HEALTH_REQUIRE_TOKEN)
+    report = {
+        'status': 'ready' if ready else 'not_ready',
+        'database': {'ok': database_ok},
+        'tokens': {'warm': warm, 'total': len(accounts), 'ages': [stats['token_age'] for stats in accounts]},
+        'upstream': {'state': upstream_state(accounts)},
+    }
+    if detailed:
+        report['database']['error'] = database_error
+        report['upstream']['accounts'] = accounts
+        report['transfer'] = ExnessApiClient.get_transfer_stats()
+    return report
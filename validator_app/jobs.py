@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .models import ValidationJob
+from .validation import validate_client
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_last_prune = 0.0
+
+PRUNE_EVERY = 3600
+
+
+def _get_executor():
+    """Lazily create this process's validation worker pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.VALIDATION_JOB_WORKERS,
+                thread_name_prefix='validation-job'
+            )
+        return _executor
+
+
+def enqueue(client_id=None, email=None):
+    """Record a validation job and hand it to the local worker pool"""
+    job = ValidationJob.objects.create(client_id=client_id or '', email=email or '')
+    _get_executor().submit(_run, job.pk)
+    _maybe_prune()
+    return job
+
+
+def _run(job_id):
+    """Worker thread body: run the validation and store its outcome on the job"""
+    close_old_connections()
+    try:
+        job = ValidationJob.objects.get(pk=job_id)
+        job.status = ValidationJob.STATUS_RUNNING
+        job.save(update_fields=['status'])
+        
+        try:
+            outcome = validate_client(client_id=job.client_id or None, email=job.email or None)
+        except Exception as e:
+            logger.exception(f"Validation job {job_id} crashed")
+            outcome = {'error': f"Unexpected error while checking the client: {e}"}
+        
+        if 'error' in outcome:
+            job.status = ValidationJob.STATUS_FAILED
+            job.error = outcome['error']
+        else:
+            job.status = ValidationJob.STATUS_DONE
+            job.is_registered = bool(outcome['is_registered'])
+            job.client_validation = outcome.get('client_validation')
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'is_registered', 'client_validation', 'finished_at'])
+    except Exception:
+        logger.exception(f"Failed to run validation job {job_id}")
+    finally:
+        # Worker threads don't go through request_finished, so close their connection here
+        connections.close_all()
+
+
+def _maybe_prune():
+    """Delete finished jobs past VALIDATION_JOB_RETENTION, at most once an hour per process"""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < PRUNE_EVERY:
+        return
+    _last_prune = now
+    cutoff = timezone.now() - timedelta(seconds=settings.VALIDATION_JOB_RETENTION)
+    deleted, _ = ValidationJob.objects.filter(created_at__lt=cutoff).delete()
+    if deleted:
+        logger.info(f"Pruned {deleted} old validation jobs")
+
+
+def job_payload(job):
+    """
+    JSON-able job state for the polling endpoint.
+    
+    Jobs left pending or running past VALIDATION_JOB_TIMEOUT (e.g. because the
+    worker that owned them restarted) are reported as failed.
+    """
+    if not job.is_finished and job.created_at < timezone.now() - timedelta(seconds=settings.VALIDATION_JOB_TIMEOUT):
+        return {'id': str(job.pk), 'status': ValidationJob.STATUS_FAILED, 'error': "The check timed out, please try again."}
+    
+    payload = {'id': str(job.pk), 'status': job.status}
+    if job.status == ValidationJob.STATUS_DONE:
+        payload['html'] = render_to_string('validator_app/_result.html', {
+            'is_registered': job.is_registered,
+            'client_validation': job.client_validation,
+        })
+    elif job.status == ValidationJob.STATUS_FAILED:
+        payload['error'] = job.error
+    return payload
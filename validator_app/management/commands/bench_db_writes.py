@@ -0,0 +1,76 @@
+import multiprocessing
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from validator_app.models import ClientValidation
+
+# Rows written by the benchmark are tagged with this client_id prefix and removed afterwards
+BENCH_PREFIX = 'bench-'
+
+
+def _write_worker(args):
+    """Run `writes` update_or_create calls the way ClientValidatorView.post does"""
+    worker, writes, accounts = args
+    
+    # Never reuse a connection inherited from the parent process
+    connections.close_all()
+    
+    errors = 0
+    for i in range(writes):
+        try:
+            ClientValidation.objects.update_or_create(
+                client_id=f"{BENCH_PREFIX}{(worker * writes + i) % accounts}",
+                defaults={
+                    'is_registered': True,
+                    'client_account_type': 'Bench',
+                    'volume_lots': i,
+                }
+            )
+        except (OperationalError, ClientValidation.MultipleObjectsReturned):
+            errors += 1
+    
+    connections.close_all()
+    return writes - errors, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure ClientValidation write throughput with several concurrent worker processes. "
+        "Run it once per database profile (default SQLite, SQLITE_HIGH_CONCURRENCY=True, "
+        "DATABASE_URL) to compare them."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent writer processes")
+        parser.add_argument('--writes', type=int, default=250, help="Writes per worker")
+        parser.add_argument('--accounts', type=int, default=100, help="Distinct client IDs to spread writes over")
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark rows")
+    
+    def handle(self, *args, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError("bench_db_writes needs the 'fork' start method")
+        
+        workers = options['workers']
+        writes = options['writes']
+        db = connections['default']
+        self.stdout.write(
+            f"Database: {db.settings_dict['ENGINE']} {db.settings_dict['NAME']} "
+            f"({workers} workers x {writes} writes)"
+        )
+        
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        start = time.perf_counter()
+        with context.Pool(workers) as pool:
+            results = pool.map(_write_worker, [(worker, writes, options['accounts']) for worker in range(workers)])
+        elapsed = time.perf_counter() - start
+        
+        succeeded = sum(ok for ok, _ in results)
+        failed = sum(errors for _, errors in results)
+        self.stdout.write(
+            f"{succeeded} writes in {elapsed:.2f}s: {succeeded / elapsed:.0f} writes/s, "
+            f"{failed} failed (database locked or duplicate rows)"
+        )
+        
+        if not options['keep']:
+            ClientValidation.objects.filter(client_id__startswith=BENCH_PREFIX).delete()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from validator_app.exports import EXPORT_FORMATS, filter_validations, iter_export
+
+
+class Command(BaseCommand):
+    help = "Stream ClientValidation records as CSV or JSON Lines in constant memory"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv', dest='export_format')
+        parser.add_argument('--output', help="File to write to (defaults to stdout)")
+        parser.add_argument('--since', help="Only records created on or after YYYY-MM-DD")
+        parser.add_argument('--until', help="Only records created on or before YYYY-MM-DD")
+        parser.add_argument('--is-registered', choices=('true', 'false'))
+        parser.add_argument('--account-type', help="Only records with this client_account_type")
+    
+    def handle(self, *args, **options):
+        try:
+            queryset = filter_validations(
+                since=options['since'],
+                until=options['until'],
+                is_registered=options['is_registered'],
+                client_account_type=options['account_type'],
+            )
+            chunks = iter_export(queryset, options['export_format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,38 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from validator_app.revalidation import revalidate_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh stored registered clients in small batches, hot clients first, "
+        "within an upstream lookup budget"
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget', type=int, default=settings.EXNESS_REVALIDATE_BUDGET,
+            help="Maximum upstream calls per batch, fallback single lookups included"
+        )
+        parser.add_argument(
+            '--rate', type=float, default=settings.EXNESS_REVALIDATE_RATE,
+            help="Maximum upstream calls per second (0 for unlimited)"
+        )
+        parser.add_argument('--loop', action='store_true', help="Keep running a batch every --interval seconds")
+        parser.add_argument(
+            '--interval', type=int, default=settings.EXNESS_REVALIDATE_INTERVAL,
+            help="Seconds between batches with --loop"
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            stats = revalidate_batch(options['budget'], rate=options['rate'])
+            self.stdout.write(
+                f"Checked {stats['checked']} clients: {stats['changed']} changed, "
+                f"{stats['unchanged']} unchanged, {stats['failed']} failed "
+                f"({stats['upstream_calls']} upstream calls)"
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,92 @@
+import cProfile
+import gzip
+import hmac
+import logging
+import marshal
+import os
+import random
+import re
+import time
+from datetime import datetime
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """
+    Capture a cProfile of sampled requests, or of requests carrying the
+    X-Profile header with PROFILING_SECRET, into PROFILING_DIR.
+    
+    Profiles are marshalled pstats data, gzip-compressed as *.prof.gz, and
+    only the newest PROFILING_MAX_FILES are kept. When neither a sample rate
+    nor a secret is configured the middleware removes itself at startup, so
+    it costs nothing to leave installed.
+    """
+    
+    SUFFIX = '.prof.gz'
+    
+    def __init__(self, get_response):
+        if settings.PROFILING_SAMPLE_RATE <= 0 and not settings.PROFILING_SECRET:
+            raise MiddlewareNotUsed
+        
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.secret = settings.PROFILING_SECRET
+        self.directory = settings.PROFILING_DIR
+        self.max_files = settings.PROFILING_MAX_FILES
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process
+            return self.get_response(request)
+        
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        try:
+            self.save(profiler, request, elapsed_ms)
+        except OSError as e:
+            logger.warning(f"Failed to write profile for {request.path}: {e}")
+        return response
+    
+    def should_profile(self, request):
+        header = request.META.get('HTTP_X_PROFILE')
+        # compare_digest only accepts ASCII str, so compare bytes
+        if header and self.secret and hmac.compare_digest(header.encode(), self.secret.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+    
+    def save(self, profiler, request, elapsed_ms):
+        """Write the profile as gzipped pstats data and rotate old profiles out"""
+        profiler.create_stats()
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+        name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{request.method}-{slug[:60]}-{elapsed_ms:.0f}ms{self.SUFFIX}"
+        path = os.path.join(self.directory, name)
+        
+        with gzip.open(path, 'wb', compresslevel=6) as f:
+            f.write(marshal.dumps(profiler.stats))
+        logger.info(f"Profiled {request.method} {request.path} ({elapsed_ms:.0f}ms) -> {path}")
+        
+        self.rotate()
+    
+    def rotate(self):
+        """Delete the oldest profiles beyond PROFILING_MAX_FILES"""
+        profiles = sorted(name for name in os.listdir(self.directory) if name.endswith(self.SUFFIX))
+        for name in profiles[:-self.max_files] if self.max_files > 0 else []:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('validator_app', '0002_client_freshness'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('client_id', models.CharField(blank=True, max_length=255)),
+                ('email', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('is_registered', models.BooleanField(null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('client_validation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='validator_app.clientvalidation')),
+            ],
+        ),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 
 class ClientValidation(models.Model):
@@ -11,6 +12,39 @@ class ClientValidation(models.Model):
     reward = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     reward_usd = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Freshness tracking for background revalidation
+    last_checked_at = models.DateTimeField(null=True, blank=True)
+    last_requested_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_changed_at = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
-        return f"{self.client_id} - {'Registered' if self.is_registered else 'Not Registered'}" 
\ No newline at end of file
+        return f"{self.client_id} - {'Registered' if self.is_registered else 'Not Registered'}" 
+
+class ValidationJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    client_id = models.CharField(max_length=255, blank=True)
+    email = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    is_registered = models.BooleanField(null=True)
+    client_validation = models.ForeignKey(ClientValidation, null=True, blank=True, on_delete=models.SET_NULL)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+    
+    def __str__(self):
+        return f"{self.client_id or self.email} - {self.status}"
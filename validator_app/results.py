@@ -0,0 +1,236 @@
+import logging
+import struct
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _to_float(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return Decimal('0.00')
+
+
+def _parse_reg_date(value):
+    if not value:
+        return None
+    try:
+        return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+    except (ValueError, TypeError):
+        logger.warning(f"Could not parse reg_date: {value}")
+        return None
+
+
+def _to_bool(value):
+    """The affiliation API sends is_affiliated as a bool or as 'true'/'false'"""
+    if isinstance(value, str):
+        return value.lower() == 'true'
+    return value is True
+
+
+class ValidationResult:
+    """
+    Normalized outcome of a registration or affiliation lookup.
+    
+    API responses are parsed once into these slots, and the result cache,
+    warm-start snapshots, ClientValidation persistence and revalidation all
+    read the same object. Only plain str/float/bool/tuple values are kept so
+    to_bytes() can pack them with struct into a compact format that doesn't
+    depend on the Python version.
+    """
+    
+    REGISTRATION = 'registration'
+    AFFILIATION = 'affiliation'
+    
+    # Bump when __slots__ or the byte layout changes so stale serialized results are rejected
+    VERSION = 2
+    
+    # to_bytes() layout: this header, then each text field and each account as
+    # a length-prefixed UTF-8 string, all in network byte order
+    _HEADER = struct.Struct('!BBddH')  # version, flags, volume_lots, volume_mln_usd, len(accounts)
+    _LENGTH = struct.Struct('!I')
+    _TEXT_FIELDS = (
+        'kind',
+        'error',
+        'message',
+        'client_account',
+        'client_account_type',
+        'reg_date',
+        'reward',
+        'reward_usd',
+        'link_code',
+    )
+    _REGISTERED = 1
+    _HAS_ERROR = 2
+    
+    __slots__ = (
+        'kind',
+        'is_registered',
+        'error',
+        'message',
+        'client_account',
+        'client_account_type',
+        'reg_date',
+        'volume_lots',
+        'volume_mln_usd',
+        'reward',
+        'reward_usd',
+        'link_code',
+        'accounts',
+    )
+    
+    def __init__(self, kind, is_registered=False, error=None, message='', client_account='',
+                 client_account_type='', reg_date='', volume_lots=0.0, volume_mln_usd=0.0,
+                 reward='0', reward_usd='0', link_code='', accounts=()):
+        self.kind = kind
+        self.is_registered = is_registered
+        self.error = error
+        self.message = message
+        self.client_account = client_account
+        self.client_account_type = client_account_type
+        self.reg_date = reg_date
+        self.volume_lots = volume_lots
+        self.volume_mln_usd = volume_mln_usd
+        self.reward = reward
+        self.reward_usd = reward_usd
+        self.link_code = link_code
+        self.accounts = accounts
+    
+    @classmethod
+    def failure(cls, message, kind=REGISTRATION):
+        """A lookup that couldn't be answered (auth, transport or HTTP error)"""
+        return cls(kind, error=message)
+    
+    @classmethod
+    def from_report_row(cls, row):
+        """A registered client from one /reports/clients/ row"""
+        return cls(
+            cls.REGISTRATION,
+            is_registered=True,
+            client_account=str(row.get('client_account') or ''),
+            client_account_type=row.get('client_account_type') or '',
+            reg_date=row.get('reg_date') or '',
+            volume_lots=_to_float(row.get('volume_lots')),
+            volume_mln_usd=_to_float(row.get('volume_mln_usd')),
+            reward=str(row.get('reward') or 0),
+            reward_usd=str(row.get('reward_usd') or 0),
+        )
+    
+    @classmethod
+    def from_registration(cls, data):
+        """Parse a /reports/clients/ payload; the first row wins"""
+        rows = data.get('data')
+        if rows:
+            return cls.from_report_row(rows[0])
+        return cls(cls.REGISTRATION)
+    
+    @classmethod
+    def from_affiliation(cls, data):
+        """
+        Parse an affiliation payload.
+        
+        An explicit is_affiliated flag decides; without one, any linked
+        accounts or a link code count as affiliated.
+        """
+        accounts = tuple(str(account) for account in data.get('accounts') or ())
+        link_code = data.get('link_code') or ''
+        if 'is_affiliated' in data:
+            is_affiliated = _to_bool(data['is_affiliated'])
+        else:
+            is_affiliated = bool(accounts or link_code)
+        return cls(cls.AFFILIATION, is_registered=is_affiliated, link_code=link_code, accounts=accounts)
+    
+    def model_fields(self):
+        """ClientValidation field values for this result"""
+        if not self.is_registered:
+            return {'is_registered': False}
+        
+        if self.kind == self.AFFILIATION:
+            return {
+                'is_registered': True,
+                'client_account': self.accounts[0] if self.accounts else '',
+                'client_account_type': 'Affiliated',
+            }
+        
+        return {
+            'is_registered': True,
+            'reg_date': _parse_reg_date(self.reg_date),
+            'client_account': self.client_account,
+            'client_account_type': self.client_account_type,
+            'volume_lots': self.volume_lots,
+            'volume_mln_usd': self.volume_mln_usd,
+            'reward': _to_decimal(self.reward),
+            'reward_usd': _to_decimal(self.reward_usd),
+        }
+    
+    def to_bytes(self):
+        """Versioned binary form for shared caches; see _HEADER for the layout"""
+        flags = (self._REGISTERED if self.is_registered else 0) | (self._HAS_ERROR if self.error is not None else 0)
+        parts = [self._HEADER.pack(self.VERSION, flags, self.volume_lots, self.volume_mln_usd, len(self.accounts))]
+        for text in [getattr(self, name) or '' for name in self._TEXT_FIELDS] + list(self.accounts):
+            encoded = str(text).encode()
+            parts.append(self._LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        return b''.join(parts)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        """Inverse of to_bytes(); raises ValueError for another version or a malformed payload"""
+        if len(data) < cls._HEADER.size:
+            raise ValueError("Truncated ValidationResult")
+        version, flags, volume_lots, volume_mln_usd, account_count = cls._HEADER.unpack_from(data)
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported ValidationResult version {version}")
+        
+        offset = cls._HEADER.size
+        texts = []
+        for _ in range(len(cls._TEXT_FIELDS) + account_count):
+            end = offset + cls._LENGTH.size
+            if end > len(data):
+                raise ValueError("Truncated ValidationResult")
+            (length,) = cls._LENGTH.unpack_from(data, offset)
+            offset, end = end, end + length
+            if end > len(data):
+                raise ValueError("Truncated ValidationResult")
+            texts.append(data[offset:end].decode())
+            offset = end
+        if offset != len(data):
+            raise ValueError("Trailing bytes after ValidationResult")
+        
+        fields = dict(zip(cls._TEXT_FIELDS, texts))
+        if not flags & cls._HAS_ERROR:
+            fields['error'] = None
+        return cls(
+            is_registered=bool(flags & cls._REGISTERED),
+            volume_lots=volume_lots,
+            volume_mln_usd=volume_mln_usd,
+            accounts=tuple(texts[len(cls._TEXT_FIELDS):]),
+            **fields,
+        )
+    
+    def to_list(self):
+        """Field values in __slots__ order, for embedding in JSON (the warm-start snapshot)"""
+        return [getattr(self, name) for name in self.__slots__]
+    
+    @classmethod
+    def from_list(cls, values):
+        """Inverse of to_list(), after a JSON round trip"""
+        if len(values) != len(cls.__slots__):
+            raise ValueError(f"Expected {len(cls.__slots__)} ValidationResult fields, got {len(values)}")
+        result = cls(*values)
+        result.accounts = tuple(result.accounts)
+        return result
+    
+    def __repr__(self):
+        state = 'error' if self.error else ('registered' if self.is_registered else 'not registered')
+        return f"<ValidationResult {self.kind} {self.client_account or ''} {state}>"
@@ -0,0 +1,154 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import ClientValidation
+from .services import ExnessApiClient
+
+logger = logging.getLogger(__name__)
+
+# Fields refreshed from /reports/clients/ data
+METRIC_FIELDS = (
+    'is_registered',
+    'reg_date',
+    'client_account_type',
+    'volume_lots',
+    'volume_mln_usd',
+    'reward',
+    'reward_usd',
+)
+
+UPDATE_BATCH_SIZE = 500
+
+
+def fields_from_result(result):
+    """The METRIC_FIELDS values of a registration ValidationResult"""
+    return {name: value for name, value in result.model_fields().items() if name in METRIC_FIELDS}
+
+
+def due_clients(now=None):
+    """
+    Registered clients due for a refresh, most urgent first.
+    
+    Hot clients (looked up by an agent within EXNESS_REVALIDATE_HOT_WINDOW)
+    are due after EXNESS_REVALIDATE_HOT_INTERVAL and come first, most
+    recently requested first. Everyone else is due after
+    EXNESS_REVALIDATE_COLD_INTERVAL, clients whose metrics changed recently
+    first, then the stalest.
+    """
+    now = now or timezone.now()
+    hot_since = now - timedelta(seconds=settings.EXNESS_REVALIDATE_HOT_WINDOW)
+    
+    def stale(seconds):
+        return Q(last_checked_at__isnull=True) | Q(last_checked_at__lt=now - timedelta(seconds=seconds))
+    
+    registered = ClientValidation.objects.filter(is_registered=True)
+    hot = registered.filter(
+        stale(settings.EXNESS_REVALIDATE_HOT_INTERVAL),
+        last_requested_at__gte=hot_since
+    ).order_by(F('last_requested_at').desc())
+    cold = registered.filter(
+        stale(settings.EXNESS_REVALIDATE_COLD_INTERVAL)
+    ).exclude(
+        last_requested_at__gte=hot_since
+    ).order_by(
+        F('last_changed_at').desc(nulls_last=True),
+        F('last_checked_at').asc(nulls_first=True)
+    )
+    return hot, cold
+
+
+def revalidate_batch(budget, rate=None, max_errors=5):
+    """
+    Refresh due clients through check_client_registration.
+    
+    With EXNESS_BATCH_WINDOW_MS set, clients are looked up
+    EXNESS_BATCH_MAX_SIZE at a time through one multi-value query. Every
+    upstream call counts against `budget` and `rate`, including the single
+    lookups a batch falls back to, so chunks shrink near the end of the
+    budget to fit their worst case of one call per client plus the batch.
+    
+    Args:
+        budget (int): Maximum upstream calls for this batch
+        rate (float): Maximum upstream calls per second, unlimited when falsy
+        max_errors (int): Stop early after this many failed lookups in a row
+        
+    Returns:
+        dict: Counts of checked, changed, unchanged and failed clients, and upstream calls
+    """
+    hot, cold = due_clients()
+    candidates = list(hot[:budget])
+    if len(candidates) < budget:
+        candidates += list(cold[:budget - len(candidates)])
+    
+    stats = {'checked': 0, 'changed': 0, 'unchanged': 0, 'failed': 0, 'upstream_calls': 0}
+    changed, unchanged, failed = [], [], []
+    consecutive_errors = 0
+    interval = 1.0 / rate if rate else 0
+    chunk_size = max(1, settings.EXNESS_BATCH_MAX_SIZE) if settings.EXNESS_BATCH_WINDOW_MS > 0 else 1
+    position = 0
+    
+    while position < len(candidates) and stats['upstream_calls'] < budget:
+        started = time.monotonic()
+        remaining = budget - stats['upstream_calls']
+        size = min(chunk_size, remaining - 1) if remaining > 2 else 1
+        chunk = candidates[position:position + size]
+        position += len(chunk)
+        accounts = [client.client_account or client.client_id for client in chunk]
+        if len(chunk) > 1:
+            results, calls = ExnessApiClient.resolve_registrations(accounts)
+        else:
+            results = {accounts[0]: ExnessApiClient.check_client_registration(client_id=accounts[0], use_cache=False)}
+            calls = 1
+        stats['upstream_calls'] += calls
+        
+        for client, account in zip(chunk, accounts):
+            result = results[account]
+            stats['checked'] += 1
+            
+            if result.error:
+                failed.append(client.pk)
+                consecutive_errors += 1
+                logger.warning(f"Revalidation of {account} failed: {result.error}")
+                if consecutive_errors >= max_errors:
+                    break
+            else:
+                consecutive_errors = 0
+                fields = fields_from_result(result)
+                diff = {name: value for name, value in fields.items() if getattr(client, name) != value}
+                if diff:
+                    for name, value in diff.items():
+                        setattr(client, name, value)
+                    changed.append(client)
+                else:
+                    unchanged.append(client.pk)
+        
+        if consecutive_errors >= max_errors:
+            logger.error(f"Stopping revalidation batch after {consecutive_errors} consecutive errors")
+            break
+        
+        if interval:
+            time.sleep(max(0, calls * interval - (time.monotonic() - started)))
+    
+    now = timezone.now()
+    for client in changed:
+        client.last_checked_at = now
+        client.last_changed_at = now
+    ClientValidation.objects.bulk_update(
+        changed,
+        METRIC_FIELDS + ('last_checked_at', 'last_changed_at'),
+        batch_size=UPDATE_BATCH_SIZE
+    )
+    # Failed clients are pushed back too, so one bad row can't starve the rest of the queue
+    checked_only = unchanged + failed
+    for start in range(0, len(checked_only), UPDATE_BATCH_SIZE):
+        ClientValidation.objects.filter(
+            pk__in=checked_only[start:start + UPDATE_BATCH_SIZE]
+        ).update(last_checked_at=now)
+    
+    stats['changed'] = len(changed)
+    stats['unchanged'] = len(unchanged)
+    stats['failed'] = len(failed)
+    return stats
@@ -2,8 +2,16 @@ import requests
 import logging
 import json
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from django.conf import settings
 from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from urllib3.util.request import ACCEPT_ENCODING
+from .accounts import AccountPool, AffiliateAccount
+from .batching import MicroBatcher
+from .results import ValidationResult
 try:
     from .selenium_auth import get_auth_token_with_selenium
 except ImportError:
@@ -24,14 +32,163 @@ class ExnessApiClient:
         'expires_at': None,
         'cookies': None
     }
+    TOKEN_LIFETIME = timedelta(hours=24)
+    AUTH_FAILED = "authentication failed"
+    
+    # Hedged V1/V2 lookups (see EXNESS_HEDGE_MODE): counters used to tune the hedge delay
+    HEDGE_STATS = {
+        'lookups': 0,
+        'hedged': 0,
+        'v1_wins': 0,
+        'v2_wins': 0,
+        'hedge_wins': 0,
+        'failures': 0
+    }
+    HEDGE_REPORT_EVERY = 100
+    _hedge_lock = threading.Lock()
+    _hedge_executor = None
+    
+    # Micro-batched client_account lookups (see EXNESS_BATCH_WINDOW_MS)
+    BATCH_STATS = {
+        'lookups': 0,
+        'upstream_calls': 0,
+        'batched_calls': 0,
+        'fallback_lookups': 0
+    }
+    _batcher = None
+    _batch_lock = threading.Lock()
+    _batch_executor = None
+    # Whether a missing row in a batch reply means "not registered": None until a
+    # reply proves the multi-value filter works (see EXNESS_BATCH_TRUST_MISSING)
+    _batch_filter_trusted = None
+    
+    # Recent positive lookups keyed by (kind, identifier): {key: (expires_at_epoch, result)}
+    RESULT_CACHE = OrderedDict()
+    RESULT_CACHE_SIZE = 1000
+    _result_lock = threading.Lock()
+    
+    # Validators and bodies of earlier GETs, keyed by (account email, url), for conditional requests
+    CONDITIONAL_CACHE = OrderedDict()
+    CONDITIONAL_CACHE_SIZE = 256
+    CONDITIONAL_MAX_BODY = 5 * 1024 * 1024
+    _conditional_bytes = 0
+    TRANSFER_REPORT_EVERY = 100
+    TRANSFER_STATS = {
+        'requests': 0,
+        'conditional_hits': 0,
+        'conditional_misses': 0,
+        'bytes_received': 0,
+        'bytes_saved_compression': 0,
+        'bytes_saved_conditional': 0
+    }
+    _transfer_lock = threading.Lock()
+    
+    # Affiliate accounts that lookups are spread across; the primary one shares TOKEN_CACHE
+    _account_pool = None
+    _account_lock = threading.Lock()
+    
+    @classmethod
+    def account_pool(cls):
+        """Build the AccountPool from EXNESS_API_ACCOUNTS, or the single configured account"""
+        with cls._account_lock:
+            if cls._account_pool is None:
+                credentials = settings.EXNESS_API_ACCOUNTS or [
+                    {'email': settings.EXNESS_API_EMAIL, 'password': settings.EXNESS_API_PASSWORD}
+                ]
+                accounts = [
+                    AffiliateAccount(
+                        credential['email'],
+                        credential['password'],
+                        token_cache=cls.TOKEN_CACHE if index == 0 else None
+                    )
+                    for index, credential in enumerate(credentials)
+                ]
+                cls._account_pool = AccountPool(
+                    accounts,
+                    strategy=settings.EXNESS_ACCOUNT_STRATEGY,
+                    eject_seconds=settings.EXNESS_ACCOUNT_EJECT_SECONDS,
+                    max_failures=settings.EXNESS_ACCOUNT_MAX_FAILURES
+                )
+                logger.info(f"Using {len(accounts)} affiliate account(s) with {settings.EXNESS_ACCOUNT_STRATEGY} scheduling")
+            return cls._account_pool
     
     @classmethod
-    def get_auth_token(cls):
+    def get_auth_token(cls, account=None):
         """Get an authentication token from the Exness API"""
         
+        account = account or cls.account_pool().primary
+        
         # Check if we have a valid cached token
-        if cls.TOKEN_CACHE['token'] and cls.TOKEN_CACHE['expires_at'] and datetime.now() < cls.TOKEN_CACHE['expires_at']:
-            return cls.TOKEN_CACHE['token']
+        if cls._cached_token(account):
+            return account.token_cache['token']
+        
+        # Only one login chain per account at a time; other callers reuse its token
+        with account.auth_lock:
+            if cls._cached_token(account):
+                return account.token_cache['token']
+            
+            token = cls._login(account)
+        
+        if not token:
+            cls.account_pool().eject(account, cls.AUTH_FAILED)
+        return token
+    
+    @classmethod
+    def warm_tokens(cls):
+        """
+        Log in every account that has no valid token yet; returns how many hold one.
+        
+        Unlike get_auth_token, this also tries accounts ejected for failed
+        logins and doesn't eject on failure, so warm-up retries keep probing
+        after a transient login error. An account that logs in is put back
+        into rotation.
+        """
+        pool = cls.account_pool()
+        warm = 0
+        for account in pool.accounts:
+            if not cls._cached_token(account):
+                with account.auth_lock:
+                    if not cls._cached_token(account):
+                        cls._login(account)
+                if not cls._cached_token(account):
+                    continue
+                if not account.is_healthy() and account.last_error == cls.AUTH_FAILED:
+                    pool.restore(account)
+            warm += 1
+        return warm
+    
+    @classmethod
+    def token_age(cls, account):
+        """Seconds since the account's current token was issued, or None without a valid token"""
+        if not cls._cached_token(account):
+            return None
+        issued_at = account.token_cache['expires_at'] - cls.TOKEN_LIFETIME
+        return max(0, round((datetime.now() - issued_at).total_seconds()))
+    
+    @staticmethod
+    def _cached_token(account):
+        """Whether the account holds an unexpired token"""
+        token_cache = account.token_cache
+        return bool(token_cache['token'] and token_cache['expires_at'] and datetime.now() < token_cache['expires_at'])
+    
+    @classmethod
+    def _observe_response(cls, account, response):
+        """Feed an upstream response into the account's health state"""
+        pool = cls.account_pool()
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After')
+            seconds = int(retry_after) if retry_after and retry_after.isdigit() else None
+            pool.eject(account, "throttled (429)", seconds)
+        elif response.status_code >= 500:
+            pool.record_failure(account, f"HTTP {response.status_code}")
+        elif response.status_code != 401:
+            pool.record_success(account)
+    
+    @classmethod
+    def _login(cls, account):
+        """Run the login chain for `account` and cache the resulting token"""
+        
+        token_cache = account.token_cache
         
         # First, try web-based authentication
         session = requests.Session()
@@ -53,8 +210,8 @@ class ExnessApiClient:
             
             # Step 2: Submit login credentials
             login_data = {
-                "email": settings.EXNESS_API_EMAIL,
-                "password": settings.EXNESS_API_PASSWORD
+                "email": account.email,
+                "password": account.password
             }
             
             login_response = session.post(
@@ -71,9 +228,9 @@ class ExnessApiClient:
                     data = login_response.json()
                     if data.get('token'):
                         # Cache the token with 24-hour expiry
-                        cls.TOKEN_CACHE['token'] = data['token']
-                        cls.TOKEN_CACHE['expires_at'] = datetime.now() + timedelta(hours=24)
-                        cls.TOKEN_CACHE['cookies'] = session.cookies
+                        token_cache['token'] = data['token']
+                        token_cache['expires_at'] = datetime.now() + cls.TOKEN_LIFETIME
+                        token_cache['cookies'] = session.cookies
                         logger.info("Successfully obtained auth token via web login")
                         return data['token']
                 except (ValueError, KeyError) as e:
@@ -88,32 +245,32 @@ class ExnessApiClient:
             {
                 "url": f"{cls.BASE_URL_V2}/auth/",
                 "payload": {
-                    "login": settings.EXNESS_API_EMAIL,
-                    "password": settings.EXNESS_API_PASSWORD
+                    "login": account.email,
+                    "password": account.password
                 }
             },
             # Method 2: V1 API with email field
             {
                 "url": f"{cls.BASE_URL_V1}/auth/",
                 "payload": {
-                    "email": settings.EXNESS_API_EMAIL,
-                    "password": settings.EXNESS_API_PASSWORD
+                    "email": account.email,
+                    "password": account.password
                 }
             },
             # Method 3: V2 API with email field
             {
                 "url": f"{cls.BASE_URL_V2}/auth/",
                 "payload": {
-                    "email": settings.EXNESS_API_EMAIL,
-                    "password": settings.EXNESS_API_PASSWORD
+                    "email": account.email,
+                    "password": account.password
                 }
             },
             # Method 4: Try login endpoint with V2 API
             {
                 "url": f"{cls.BASE_URL_V2}/login/",
                 "payload": {
-                    "email": settings.EXNESS_API_EMAIL,
-                    "password": settings.EXNESS_API_PASSWORD
+                    "email": account.email,
+                    "password": account.password
                 }
             }
         ]
@@ -133,8 +290,8 @@ class ExnessApiClient:
                     token = data.get('token')
                     if token:
                         # Cache the token with 24-hour expiry
-                        cls.TOKEN_CACHE['token'] = token
-                        cls.TOKEN_CACHE['expires_at'] = datetime.now() + timedelta(hours=24)
+                        token_cache['token'] = token
+                        token_cache['expires_at'] = datetime.now() + cls.TOKEN_LIFETIME
                         logger.info("Successfully obtained auth token")
                         return token
                     else:
@@ -154,21 +311,21 @@ class ExnessApiClient:
             try:
                 logger.info("All API methods failed. Attempting Selenium authentication as last resort.")
                 selenium_result = get_auth_token_with_selenium(
-                    settings.EXNESS_API_EMAIL, 
-                    settings.EXNESS_API_PASSWORD
+                    account.email, 
+                    account.password
                 )
                 
                 if selenium_result and selenium_result.get('token'):
                     # Cache the token with 24-hour expiry
-                    cls.TOKEN_CACHE['token'] = selenium_result['token']
-                    cls.TOKEN_CACHE['expires_at'] = datetime.now() + timedelta(hours=24)
-                    cls.TOKEN_CACHE['cookies'] = selenium_result.get('cookies')
+                    token_cache['token'] = selenium_result['token']
+                    token_cache['expires_at'] = datetime.now() + cls.TOKEN_LIFETIME
+                    token_cache['cookies'] = selenium_result.get('cookies')
                     logger.info("Successfully obtained auth token via Selenium")
                     return selenium_result['token']
                 elif selenium_result and selenium_result.get('cookies'):
                     # We have cookies but no token
                     logger.info("No token obtained but got cookies via Selenium")
-                    cls.TOKEN_CACHE['cookies'] = selenium_result['cookies']
+                    token_cache['cookies'] = selenium_result['cookies']
             except Exception as e:
                 logger.error(f"Selenium authentication failed: {e}")
         
@@ -176,17 +333,288 @@ class ExnessApiClient:
         return None
     
     @classmethod
-    def check_client_registration(cls, client_id=None, email=None):
-        """Check if a client is registered under the affiliate account"""
+    def get_cached_result(cls, key):
+        """Return a fresh cached lookup result for `key`, or None"""
+        with cls._result_lock:
+            entry = cls.RESULT_CACHE.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del cls.RESULT_CACHE[key]
+                return None
+            cls.RESULT_CACHE.move_to_end(key)
+            return entry[1]
+    
+    @classmethod
+    def cache_result(cls, key, result, expires_at=None):
+        """Cache a positive lookup result for EXNESS_RESULT_CACHE_TTL seconds"""
+        if expires_at is None:
+            if settings.EXNESS_RESULT_CACHE_TTL <= 0:
+                return
+            expires_at = time.time() + settings.EXNESS_RESULT_CACHE_TTL
+        
+        with cls._result_lock:
+            cls.RESULT_CACHE[key] = (expires_at, result)
+            cls.RESULT_CACHE.move_to_end(key)
+            while len(cls.RESULT_CACHE) > cls.RESULT_CACHE_SIZE:
+                cls.RESULT_CACHE.popitem(last=False)
+    
+    @classmethod
+    def check_client_registration(cls, client_id=None, email=None, use_cache=True):
+        """Check if a client is registered under the affiliate account; returns a ValidationResult"""
+        
+        key = ('registration', client_id or email)
+        cached = cls.get_cached_result(key) if use_cache else None
+        if cached is not None:
+            return cached
+        
+        # Concurrent lookups by account number share multi-value report queries
+        if client_id and settings.EXNESS_BATCH_WINDOW_MS > 0:
+            try:
+                return cls._get_batcher().submit(client_id).result(timeout=settings.EXNESS_BATCH_WAIT)
+            except Exception as e:
+                logger.error(f"Batched registration lookup for {client_id} failed: {e}")
+                return ValidationResult.failure(f"Error checking client registration: {e}")
+        
+        with cls.account_pool().lease() as account:
+            result = cls._fetch_client_registration(client_id=client_id, email=email, account=account)
+        if result.is_registered:
+            cls.cache_result(key, result)
+        return result
+    
+    @classmethod
+    def _get_batcher(cls):
+        with cls._batch_lock:
+            if cls._batcher is None:
+                cls._batcher = MicroBatcher(
+                    cls.lookup_registrations,
+                    window=settings.EXNESS_BATCH_WINDOW_MS / 1000,
+                    max_size=settings.EXNESS_BATCH_MAX_SIZE
+                )
+            return cls._batcher
+    
+    @classmethod
+    def lookup_registrations(cls, client_ids):
+        """
+        Look up many client accounts with as few upstream calls as possible.
+        
+        Returns:
+            dict: check_client_registration result per client account
+        """
+        return cls.resolve_registrations(client_ids)[0]
+    
+    @classmethod
+    def resolve_registrations(cls, client_ids):
+        """
+        Look up client accounts in batches and report the upstream calls it took.
+        
+        Accounts are queried EXNESS_BATCH_MAX_SIZE at a time through one
+        multi-value client_account filter. Once the filter is trusted (see
+        _batch_trusts_missing), an account missing from a valid reply is not
+        registered. Until then, and for any chunk whose reply was rejected,
+        the accounts without a row are re-checked with single lookups run
+        concurrently across the account pool. Positive results are cached like
+        single lookups.
+        
+        Returns:
+            tuple: ({client account: ValidationResult}, upstream calls made)
+        """
+        client_ids = list(dict.fromkeys(client_ids))
+        size = max(1, settings.EXNESS_BATCH_MAX_SIZE)
+        results = {}
+        upstream_calls = 0
+        batched_calls = 0
+        fallback_lookups = 0
+        
+        for start in range(0, len(client_ids), size):
+            chunk = client_ids[start:start + size]
+            batch = None
+            if len(chunk) > 1:
+                with cls.account_pool().lease() as account:
+                    batch = cls._fetch_client_batch(chunk, account)
+                upstream_calls += 1
+                batched_calls += 1
+            
+            if batch is not None and cls._batch_trusts_missing(batch):
+                for client_id in chunk:
+                    results[client_id] = batch.get(client_id) or ValidationResult(ValidationResult.REGISTRATION)
+                continue
+            
+            missing = [client_id for client_id in chunk if client_id not in (batch or {})]
+            singles = cls._lookup_singles(missing)
+            upstream_calls += len(missing)
+            if len(chunk) > 1:
+                fallback_lookups += len(missing)
+            
+            # A registered account the reply left out means the filter can't be trusted
+            if batch is not None and any(result.is_registered for result in singles.values()):
+                cls._distrust_batch_filter()
+            results.update(batch or {})
+            results.update(singles)
+        
+        for client_id, result in results.items():
+            if result.is_registered:
+                cls.cache_result(('registration', client_id), result)
+        
+        with cls._batch_lock:
+            cls.BATCH_STATS['lookups'] += len(client_ids)
+            cls.BATCH_STATS['upstream_calls'] += upstream_calls
+            cls.BATCH_STATS['batched_calls'] += batched_calls
+            cls.BATCH_STATS['fallback_lookups'] += fallback_lookups
+        logger.debug(f"Resolved {len(client_ids)} client lookups with {upstream_calls} upstream call(s)")
+        return results, upstream_calls
+    
+    @classmethod
+    def _batch_trusts_missing(cls, batch):
+        """
+        Whether accounts absent from this valid batch reply can be taken as not registered.
+        
+        EXNESS_BATCH_TRUST_MISSING 'always' or 'never' decides outright. In
+        'auto' mode the filter is trusted once one reply has returned rows for
+        two or more requested accounts (and, as _route_batch_rows checks, no
+        unrequested ones), which an API that ignores the filter or reads
+        '1,2,3' as a single account can't produce.
+        """
+        mode = settings.EXNESS_BATCH_TRUST_MISSING
+        if mode in ('always', 'never'):
+            return mode == 'always'
+        
+        with cls._batch_lock:
+            if cls._batch_filter_trusted is None and len(batch) >= 2:
+                cls._batch_filter_trusted = True
+                logger.info("Batch filter returned several requested accounts; trusting missing rows from now on")
+            return cls._batch_filter_trusted is True
+    
+    @classmethod
+    def _distrust_batch_filter(cls):
+        with cls._batch_lock:
+            if cls._batch_filter_trusted is not False:
+                logger.warning("Batch reply left out a registered account; checking missing rows individually from now on")
+            cls._batch_filter_trusted = False
+    
+    @classmethod
+    def _lookup_singles(cls, client_ids):
+        """Look up accounts one per call, concurrently, each on an account leased from the pool"""
+        if not client_ids:
+            return {}
+        
+        def lookup(client_id):
+            with cls.account_pool().lease() as account:
+                return cls._fetch_client_registration(client_id=client_id, account=account)
+        
+        if len(client_ids) == 1:
+            return {client_ids[0]: lookup(client_ids[0])}
+        return dict(zip(client_ids, cls._get_batch_executor().map(lookup, client_ids)))
+    
+    @classmethod
+    def _get_batch_executor(cls):
+        """Lazily create the thread pool for fallback single lookups"""
+        with cls._batch_lock:
+            if cls._batch_executor is None:
+                cls._batch_executor = ThreadPoolExecutor(
+                    max_workers=settings.EXNESS_BATCH_FALLBACK_WORKERS,
+                    thread_name_prefix='exness-batch'
+                )
+            return cls._batch_executor
+    
+    @classmethod
+    def _fetch_client_batch(cls, client_ids, account):
+        """
+        Look up several client accounts with a single multi-value filter request.
+        
+        Returns {client_id: result} for the requested accounts that came back,
+        or None when the answer can't be trusted (request failed, filter
+        ignored, or results span more than one page).
+        """
+        token = cls.get_auth_token(account)
+        if not token:
+            return None
+        
+        session = cls._new_api_session(account)
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Accept": "application/json, text/plain, */*",
+            "Accept-Language": "en-US,en;q=0.9",
+            "Origin": "https://my.exnessaffiliates.com",
+            "Referer": "https://my.exnessaffiliates.com/en/reports/",
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}"
+        }
+        
+        # 'csv' sends client_account=1,2,3; 'repeat' sends client_account=1&client_account=2
+        if settings.EXNESS_BATCH_FILTER_STYLE == 'repeat':
+            query = urlencode([('client_account', client_id) for client_id in client_ids])
+        else:
+            query = urlencode({'client_account': ','.join(client_ids)}, safe=',')
+        
+        for base_url in (cls.BASE_URL_V1, cls.BASE_URL_V2):
+            url = f"{base_url}/reports/clients/?{query}"
+            try:
+                logger.info(f"Checking {len(client_ids)} client registrations using URL: {url}")
+                response = cls._api_get(session, url, account, headers=headers)
+                
+                # Refresh the token once, like single lookups do
+                if response.status_code == 401:
+                    account.token_cache['token'] = None
+                    account.token_cache['expires_at'] = None
+                    token = cls.get_auth_token(account)
+                    if not token:
+                        return None
+                    headers["Authorization"] = f"Bearer {token}"
+                    response = cls._api_get(session, url, account, headers=headers)
+                
+                cls._observe_response(account, response)
+                if response.status_code == 200:
+                    return cls._route_batch_rows(client_ids, response.json())
+                logger.warning(f"Batched API request failed with {base_url}: {response.status_code}")
+            except (requests.RequestException, ValueError) as e:
+                logger.error(f"Error in batched client registration check: {str(e)}")
+                cls.account_pool().record_failure(account, str(e))
+        return None
+    
+    @classmethod
+    def _route_batch_rows(cls, client_ids, data):
+        """Split a multi-value /reports/clients/ payload into results for the accounts it contains"""
+        rows = data.get('data') or []
+        by_account = {}
+        for row in rows:
+            by_account.setdefault(str(row.get('client_account')), row)
+        
+        unexpected = set(by_account) - set(client_ids)
+        if unexpected:
+            logger.warning(f"Batch filter returned {len(unexpected)} unrequested account(s); the API may not support multi-value filters")
+            return None
+        total = data.get('totalCount', data.get('count'))
+        if data.get('next') or (isinstance(total, int) and total > len(rows)):
+            logger.warning("Batched lookup spans more than one page; use a smaller EXNESS_BATCH_MAX_SIZE")
+            return None
         
-        token = cls.get_auth_token()
+        return {
+            client_id: ValidationResult.from_report_row(by_account[client_id])
+            for client_id in client_ids
+            if client_id in by_account
+        }
+    
+    @classmethod
+    def get_batch_stats(cls):
+        """Return the batching counters along with upstream calls per lookup"""
+        with cls._batch_lock:
+            stats = dict(cls.BATCH_STATS)
+        
+        stats['calls_per_lookup'] = stats['upstream_calls'] / stats['lookups'] if stats['lookups'] else 0.0
+        return stats
+    
+    @classmethod
+    def _fetch_client_registration(cls, client_id=None, email=None, account=None):
+        """Look up a client's registration in the reports API, bypassing the result cache"""
+        
+        account = account or cls.account_pool().primary
+        token = cls.get_auth_token(account)
         if not token:
-            return {"error": "Failed to authenticate with the Exness API"}
+            return ValidationResult.failure("Failed to authenticate with the Exness API")
         
         # Create a session and use stored cookies if available
-        session = requests.Session()
-        if cls.TOKEN_CACHE.get('cookies'):
-            session.cookies.update(cls.TOKEN_CACHE['cookies'])
+        session = cls._new_api_session(account)
         
         # Browser-like headers for API requests
         headers = {
@@ -199,6 +627,11 @@ class ExnessApiClient:
             "Authorization": f"Bearer {token}"
         }
         
+        # Hedged mode races V1 against V2 instead of waiting for V1 to fail first
+        if settings.EXNESS_HEDGE_MODE in ('delayed', 'parallel') and (client_id or email):
+            query = f"client_account={client_id}" if client_id else f"email={email}"
+            return cls._check_client_registration_hedged(f"/reports/clients/?{query}", headers, account)
+        
         # Try both API versions
         api_versions = [cls.BASE_URL_V1, cls.BASE_URL_V2]
         
@@ -210,55 +643,35 @@ class ExnessApiClient:
                 # Assuming the API allows searching by email
                 url = f"{base_url}/reports/clients/?email={email}"
             else:
-                return {"error": "Either client_id or email must be provided"}
+                return ValidationResult.failure("Either client_id or email must be provided")
             
             try:
                 logger.info(f"Checking client registration using URL: {url}")
-                response = session.get(url, headers=headers)
+                response = cls._api_get(session, url, account, headers=headers)
+                cls._observe_response(account, response)
                 logger.debug(f"Client check response status: {response.status_code}")
-                logger.debug(f"Client check response content: {response.text}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    # Decoding large report pages is only worth it when it gets logged
+                    logger.debug(f"Client check response content: {response.text}")
                 
                 if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Check if the client exists in the response data
-                    if data.get('data') and len(data['data']) > 0:
-                        # Return the client data
-                        return {
-                            "status": "success",
-                            "is_registered": True,
-                            "client_data": data['data'][0]
-                        }
-                    else:
-                        # Client not found
-                        return {
-                            "status": "success",
-                            "is_registered": False,
-                            "client_data": None
-                        }
+                    return ValidationResult.from_registration(response.json())
                 
                 # If auth failed, try refreshing the token once
                 elif response.status_code == 401 and base_url == api_versions[-1]: 
                     # Clear the cached token
-                    cls.TOKEN_CACHE['token'] = None
-                    cls.TOKEN_CACHE['expires_at'] = None
+                    account.token_cache['token'] = None
+                    account.token_cache['expires_at'] = None
                     
                     # Try again with a new token
-                    new_token = cls.get_auth_token()
+                    new_token = cls.get_auth_token(account)
                     if new_token:
                         headers["Authorization"] = f"Bearer {new_token}"
-                        retry_response = session.get(url, headers=headers)
+                        retry_response = cls._api_get(session, url, account, headers=headers)
+                        cls._observe_response(account, retry_response)
                         
                         if retry_response.status_code == 200:
-                            retry_data = retry_response.json()
-                            is_registered = retry_data.get('data') and len(retry_data['data']) > 0
-                            client_data = retry_data['data'][0] if is_registered else None
-                            
-                            return {
-                                "status": "success",
-                                "is_registered": is_registered,
-                                "client_data": client_data
-                            }
+                            return ValidationResult.from_registration(retry_response.json())
                 
                 # Continue to try the next API version if this one failed
                 logger.warning(f"API request failed with {base_url}: {response.status_code}")
@@ -266,14 +679,311 @@ class ExnessApiClient:
                     continue
                 
                 logger.error(f"All API requests failed: {response.status_code} - {response.text}")
-                return {"error": f"API request failed with status code: {response.status_code}"}
+                return ValidationResult.failure(f"API request failed with status code: {response.status_code}")
                 
             except requests.RequestException as e:
                 logger.error(f"Error checking client registration: {str(e)}")
+                cls.account_pool().record_failure(account, str(e))
                 if base_url != api_versions[-1]:  # If not the last API version, try the next one
                     continue
-                return {"error": f"Error checking client registration: {str(e)}"}
+                return ValidationResult.failure(f"Error checking client registration: {str(e)}")
+                
+    @classmethod
+    def _check_client_registration_hedged(cls, path, headers, account):
+        """Run a registration lookup through the hedged V1/V2 race and handle a 401 once"""
+        
+        base_url, outcome, payload = cls._hedged_get(path, headers, account)
+        
+        if payload is not None:
+            return ValidationResult.from_registration(payload)
+        
+        if isinstance(outcome, requests.Response):
+            # If auth failed, try refreshing the token once against V2
+            if outcome.status_code == 401:
+                account.token_cache['token'] = None
+                account.token_cache['expires_at'] = None
+                
+                new_token = cls.get_auth_token(account)
+                if new_token:
+                    headers = dict(headers, Authorization=f"Bearer {new_token}")
+                    session = cls._new_api_session(account)
+                    try:
+                        retry_response = cls._api_get(
+                            session,
+                            f"{cls.BASE_URL_V2}{path}",
+                            account,
+                            headers=headers,
+                            timeout=settings.EXNESS_API_TIMEOUT
+                        )
+                        cls._observe_response(account, retry_response)
+                        if retry_response.status_code == 200:
+                            return ValidationResult.from_registration(retry_response.json())
+                    except (requests.RequestException, ValueError) as e:
+                        logger.error(f"Error checking client registration: {str(e)}")
+                        cls.account_pool().record_failure(account, str(e))
+                        return ValidationResult.failure(f"Error checking client registration: {str(e)}")
+                    finally:
+                        session.close()
+            
+            logger.error(f"All API requests failed: {outcome.status_code} - {outcome.text}")
+            return ValidationResult.failure(f"API request failed with status code: {outcome.status_code}")
+        
+        logger.error(f"Error checking client registration via {base_url}: {outcome}")
+        return ValidationResult.failure(f"Error checking client registration: {str(outcome)}")
+    
+    @classmethod
+    def _hedged_get(cls, path, headers, account):
+        """
+        GET `path` from V1 and hedge it with the same request against V2.
+        
+        In 'delayed' mode V2 is only fired when V1 has been running for
+        EXNESS_HEDGE_DELAY_MS without an answer; in 'parallel' mode (or with no
+        delay) both are submitted together. V2 is also fired straight away when
+        V1 fails, matching the sequential fallback. A 200 whose body parses as
+        JSON wins; a 200 that doesn't parse (e.g. a WAF page) is a failed
+        attempt. A request can't be interrupted from another thread, so each
+        attempt gets a read timeout of EXNESS_HEDGE_ATTEMPT_TIMEOUT: that bounds
+        how long a losing request keeps its pool thread. Time V1 spends queued
+        behind busy pool threads doesn't count towards the hedge delay.
+        
+        Returns:
+            tuple: (base_url, response, payload) for the winner, otherwise
+            (base_url, response or exception, None) for the last attempt that finished
+        """
+        delay = settings.EXNESS_HEDGE_DELAY_MS / 1000.0
+        parallel = settings.EXNESS_HEDGE_MODE == 'parallel' or delay <= 0
+        
+        executor = cls._get_hedge_executor()
+        sessions = {}
+        pending = {}
+        started = {}
+        attempt_timeout = (settings.EXNESS_API_TIMEOUT, min(settings.EXNESS_API_TIMEOUT, settings.EXNESS_HEDGE_ATTEMPT_TIMEOUT))
+        
+        def attempt(base_url, session):
+            started[base_url] = time.monotonic()
+            response = cls._api_get(session, f"{base_url}{path}", account, headers=headers, timeout=attempt_timeout)
+            # Parse here so an unreadable 200 loses the race instead of winning it
+            payload = response.json() if response.status_code == 200 else None
+            return response, payload
+        
+        def launch(base_url):
+            session = cls._new_api_session(account)
+            sessions[base_url] = session
+            pending[executor.submit(attempt, base_url, session)] = base_url
+        
+        launch(cls.BASE_URL_V1)
+        hedged = False
+        fallback = False
+        if parallel:
+            launch(cls.BASE_URL_V2)
+            hedged = True
+        winner = None
+        last = (cls.BASE_URL_V1, None, None)
+        
+        try:
+            while pending:
+                if hedged or fallback:
+                    timeout = None
+                elif cls.BASE_URL_V1 in started:
+                    timeout = max(0.0, started[cls.BASE_URL_V1] + delay - time.monotonic())
+                else:
+                    # V1 is still queued behind other lookups; a hedge would only queue too
+                    timeout = delay
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                if not done:
+                    if cls.BASE_URL_V1 not in started or time.monotonic() - started[cls.BASE_URL_V1] < delay:
+                        continue
+                    
+                    # V1 is slow: fire the hedge
+                    hedged = True
+                    logger.debug(f"Hedging {path} to {cls.BASE_URL_V2} after {delay:.3f}s")
+                    launch(cls.BASE_URL_V2)
+                    continue
+                
+                for future in done:
+                    base_url = pending.pop(future)
+                    try:
+                        response, payload = future.result()
+                    except (requests.RequestException, ValueError) as e:
+                        logger.warning(f"API request failed with {base_url}: {e}")
+                        cls.account_pool().record_failure(account, str(e))
+                        last = (base_url, e, None)
+                        continue
+                    
+                    cls._observe_response(account, response)
+                    if payload is not None and winner is None:
+                        winner = (base_url, response, payload)
+                    else:
+                        logger.warning(f"API request failed with {base_url}: {response.status_code}")
+                        last = (base_url, response, None)
+                
+                if winner:
+                    break
                 
+                # V1 failed before the hedge went out: fall back to V2 right away
+                if not hedged and not fallback:
+                    fallback = True
+                    launch(cls.BASE_URL_V2)
+        finally:
+            # Drop the loser if still queued; a running one ends by its read timeout
+            for future in pending:
+                future.cancel()
+            for session in sessions.values():
+                session.close()
+        
+        cls._record_hedge(hedged, winner[0] if winner else None)
+        return winner or last
+    
+    @classmethod
+    def _get_hedge_executor(cls):
+        """Lazily create the thread pool shared by hedged requests"""
+        with cls._hedge_lock:
+            if cls._hedge_executor is None:
+                cls._hedge_executor = ThreadPoolExecutor(
+                    max_workers=settings.EXNESS_HEDGE_MAX_WORKERS,
+                    thread_name_prefix='exness-hedge'
+                )
+            return cls._hedge_executor
+    
+    @classmethod
+    def _record_hedge(cls, hedged, winning_url):
+        """Update the hedge counters and periodically log hedge and win rates"""
+        with cls._hedge_lock:
+            stats = cls.HEDGE_STATS
+            stats['lookups'] += 1
+            if hedged:
+                stats['hedged'] += 1
+            if winning_url == cls.BASE_URL_V1:
+                stats['v1_wins'] += 1
+            elif winning_url == cls.BASE_URL_V2:
+                stats['v2_wins'] += 1
+                # V2 wins from the plain fallback (V1 failed before any hedge) don't count here
+                if hedged:
+                    stats['hedge_wins'] += 1
+            else:
+                stats['failures'] += 1
+            report = stats['lookups'] % cls.HEDGE_REPORT_EVERY == 0
+        
+        if report:
+            summary = cls.get_hedge_stats()
+            logger.info(
+                f"Hedge stats: {summary['lookups']} lookups, "
+                f"hedge rate {summary['hedge_rate']:.1%}, "
+                f"V2 win rate when hedged {summary['hedge_win_rate']:.1%}"
+            )
+    
+    @classmethod
+    def get_hedge_stats(cls):
+        """Return the hedge counters along with hedge rate and hedge win rate"""
+        with cls._hedge_lock:
+            stats = dict(cls.HEDGE_STATS)
+        
+        stats['hedge_rate'] = stats['hedged'] / stats['lookups'] if stats['lookups'] else 0.0
+        stats['hedge_win_rate'] = stats['hedge_wins'] / stats['hedged'] if stats['hedged'] else 0.0
+        return stats
+    
+    @classmethod
+    def _api_get(cls, session, url, account, headers=None, **kwargs):
+        """
+        GET an API URL with compression negotiated and cached validators replayed.
+        
+        Accept-Encoding advertises every coding urllib3 can decode (brotli when
+        installed). If an earlier response for the same account and URL carried
+        an ETag or Last-Modified, they are sent back as If-None-Match /
+        If-Modified-Since, and a 304 is turned into a 200 with the cached body,
+        so callers never see the difference.
+        """
+        key = (account.email, url)
+        headers = dict(headers or {})
+        headers['Accept-Encoding'] = ACCEPT_ENCODING
+        
+        with cls._transfer_lock:
+            cached = cls.CONDITIONAL_CACHE.get(key)
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        
+        response = session.get(url, headers=headers, **kwargs)
+        
+        # Wire size before decompression, when urllib3 can tell us
+        try:
+            wire_bytes = response.raw.tell() if response.raw is not None else None
+        except (AttributeError, OSError):
+            wire_bytes = None
+        if not wire_bytes:
+            wire_bytes = int(response.headers.get('Content-Length') or len(response.content))
+        
+        with cls._transfer_lock:
+            stats = cls.TRANSFER_STATS
+            stats['requests'] += 1
+            stats['bytes_received'] += wire_bytes
+            
+            if response.status_code == 304 and cached:
+                stats['conditional_hits'] += 1
+                stats['bytes_saved_conditional'] += len(cached['content'])
+                cls.CONDITIONAL_CACHE.move_to_end(key)
+                response.status_code = 200
+                response._content = cached['content']
+                response.encoding = cached['encoding']
+                return response
+            
+            if cached:
+                stats['conditional_misses'] += 1
+            if response.headers.get('Content-Encoding'):
+                stats['bytes_saved_compression'] += max(0, len(response.content) - wire_bytes)
+            
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            max_bytes = settings.EXNESS_CONDITIONAL_CACHE_BYTES
+            if response.status_code == 200 and (etag or last_modified) and len(response.content) <= min(cls.CONDITIONAL_MAX_BODY, max_bytes):
+                previous = cls.CONDITIONAL_CACHE.pop(key, None)
+                if previous:
+                    cls._conditional_bytes -= len(previous['content'])
+                cls.CONDITIONAL_CACHE[key] = {
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'content': response.content,
+                    'encoding': response.encoding
+                }
+                cls._conditional_bytes += len(response.content)
+                # Bounded by total body bytes as well as entry count
+                while len(cls.CONDITIONAL_CACHE) > cls.CONDITIONAL_CACHE_SIZE or cls._conditional_bytes > max_bytes:
+                    _, evicted = cls.CONDITIONAL_CACHE.popitem(last=False)
+                    cls._conditional_bytes -= len(evicted['content'])
+            
+            report = stats['requests'] % cls.TRANSFER_REPORT_EVERY == 0
+        
+        if report:
+            summary = cls.get_transfer_stats()
+            logger.info(
+                f"Transfer stats: {summary['requests']} API GETs, "
+                f"{summary['conditional_hits']} conditional hits / {summary['conditional_misses']} misses, "
+                f"{summary['bytes_received']} bytes received, "
+                f"{summary['bytes_saved_compression']} saved by compression, "
+                f"{summary['bytes_saved_conditional']} saved by conditional requests"
+            )
+        return response
+    
+    @classmethod
+    def get_transfer_stats(cls):
+        """Return conditional hit/miss and bytes-saved counters for API GETs, plus the validator cache size"""
+        with cls._transfer_lock:
+            stats = dict(cls.TRANSFER_STATS)
+            stats['cached_entries'] = len(cls.CONDITIONAL_CACHE)
+            stats['cached_bytes'] = cls._conditional_bytes
+        return stats
+    
+    @classmethod
+    def _new_api_session(cls, account):
+        """Create a requests session carrying the account's cached auth cookies"""
+        session = requests.Session()
+        if account.token_cache.get('cookies'):
+            session.cookies.update(account.token_cache['cookies'])
+        return session
+    
     @classmethod
     def check_client_affiliation(cls, email):
         """
@@ -284,16 +994,29 @@ class ExnessApiClient:
             email (str): The email address to check
             
         Returns:
-            dict: Response with affiliation status
+            ValidationResult: Affiliation status, with is_registered set when affiliated
         """
-        token = cls.get_auth_token()
+        key = ('affiliation', email)
+        cached = cls.get_cached_result(key)
+        if cached is not None:
+            return cached
+        
+        with cls.account_pool().lease() as account:
+            result = cls._fetch_client_affiliation(email, account=account)
+        if result.is_registered:
+            cls.cache_result(key, result)
+        return result
+    
+    @classmethod
+    def _fetch_client_affiliation(cls, email, account=None):
+        """Call the affiliation endpoint for `email`, bypassing the result cache"""
+        account = account or cls.account_pool().primary
+        token = cls.get_auth_token(account)
         if not token:
-            return {"error": "Failed to authenticate with the Exness API"}
+            return ValidationResult.failure("Failed to authenticate with the Exness API", ValidationResult.AFFILIATION)
         
         # Create a session and use stored cookies if available
-        session = requests.Session()
-        if cls.TOKEN_CACHE.get('cookies'):
-            session.cookies.update(cls.TOKEN_CACHE['cookies'])
+        session = cls._new_api_session(account)
         
         # Browser-like headers for API requests
         headers = {
@@ -317,115 +1040,63 @@ class ExnessApiClient:
         try:
             logger.info(f"Checking client affiliation using URL: {url}")
             response = session.post(url, json=payload, headers=headers)
+            cls._observe_response(account, response)
             logger.debug(f"Affiliation check response status: {response.status_code}")
             logger.debug(f"Affiliation check response content: {response.text}")
             
             # Check for a successful response (HTTP 200)
             if response.status_code == 200:
-                try:
-                    data = response.json()
-                    logger.info(f"Received valid JSON response: {data}")
-                    
-                    # Get the is_affiliated value and convert to bool if needed
-                    # The API might return a boolean, string, or have a different structure
-                    is_affiliated = False
-                    
-                    # If API explicitly provides is_affiliated field
-                    if 'is_affiliated' in data:
-                        # Handle different possible formats (boolean or string)
-                        if isinstance(data['is_affiliated'], bool):
-                            is_affiliated = data['is_affiliated']
-                        elif isinstance(data['is_affiliated'], str):
-                            is_affiliated = data['is_affiliated'].lower() == 'true'
-                    
-                    # Alternatively, check if there are accounts or other indicators of affiliation
-                    elif 'accounts' in data and data['accounts'] and len(data['accounts']) > 0:
-                        is_affiliated = True
-                    
-                    # Check for link_code as another potential indicator
-                    elif 'link_code' in data and data['link_code']:
-                        is_affiliated = True
-                    
-                    return {
-                        "status": "success",
-                        "is_affiliated": is_affiliated,
-                        "link_code": data.get('link_code', ''),
-                        "accounts": data.get('accounts', [])
-                    }
-                except (ValueError, KeyError) as e:
-                    logger.error(f"Failed to parse JSON response: {e}")
-                    return {
-                        "status": "error",
-                        "message": f"Failed to parse API response: {e}",
-                        "is_affiliated": False
-                    }
+                return cls._affiliation_result(response)
             
             # For 404, we can confidently say the client is not affiliated
             elif response.status_code == 404:
-                return {
-                    "status": "success",
-                    "is_affiliated": False,
-                    "message": "Client not found or not affiliated"
-                }
+                return ValidationResult(ValidationResult.AFFILIATION, message="Client not found or not affiliated")
             
             # If auth failed, try refreshing the token once
             elif response.status_code == 401:
                 # Clear the cached token
-                cls.TOKEN_CACHE['token'] = None
-                cls.TOKEN_CACHE['expires_at'] = None
+                account.token_cache['token'] = None
+                account.token_cache['expires_at'] = None
                 
                 # Try again with a new token
-                new_token = cls.get_auth_token()
+                new_token = cls.get_auth_token(account)
                 if new_token:
                     headers["Authorization"] = f"Bearer {new_token}"
                     retry_response = session.post(url, json=payload, headers=headers)
+                    cls._observe_response(account, retry_response)
                     
                     if retry_response.status_code == 200:
-                        try:
-                            retry_data = retry_response.json()
-                            # Apply the same logic as above
-                            is_affiliated = False
-                            
-                            if 'is_affiliated' in retry_data:
-                                if isinstance(retry_data['is_affiliated'], bool):
-                                    is_affiliated = retry_data['is_affiliated']
-                                elif isinstance(retry_data['is_affiliated'], str):
-                                    is_affiliated = retry_data['is_affiliated'].lower() == 'true'
-                            elif 'accounts' in retry_data and retry_data['accounts'] and len(retry_data['accounts']) > 0:
-                                is_affiliated = True
-                            elif 'link_code' in retry_data and retry_data['link_code']:
-                                is_affiliated = True
-                                
-                            return {
-                                "status": "success",
-                                "is_affiliated": is_affiliated,
-                                "link_code": retry_data.get('link_code', ''),
-                                "accounts": retry_data.get('accounts', [])
-                            }
-                        except (ValueError, KeyError) as e:
-                            logger.error(f"Failed to parse JSON response on retry: {e}")
+                        return cls._affiliation_result(retry_response)
                     
                     # Not affiliated case after token refresh
                     if retry_response.status_code == 404:
-                        return {
-                            "status": "success",
-                            "is_affiliated": False,
-                            "message": "Client not found or not affiliated (after token refresh)"
-                        }
+                        return ValidationResult(
+                            ValidationResult.AFFILIATION,
+                            message="Client not found or not affiliated (after token refresh)"
+                        )
             
             # For all other status codes, log the error and assume not affiliated
             logger.error(f"API request failed: {response.status_code} - {response.text}")
-            return {
-                "status": "error",
-                "code": response.status_code,
-                "message": f"API request failed with status code: {response.status_code}",
-                "is_affiliated": False
-            }
+            return ValidationResult(
+                ValidationResult.AFFILIATION,
+                message=f"API request failed with status code: {response.status_code}"
+            )
             
         except requests.RequestException as e:
             logger.error(f"Error checking client affiliation: {str(e)}")
-            return {
-                "status": "error", 
-                "message": f"Error checking client affiliation: {str(e)}",
-                "is_affiliated": False
-            } 
\ No newline at end of file
+            cls.account_pool().record_failure(account, str(e))
+            return ValidationResult(
+                ValidationResult.AFFILIATION,
+                message=f"Error checking client affiliation: {str(e)}"
+            )
+    
+    @staticmethod
+    def _affiliation_result(response):
+        """Parse a 200 affiliation response; unparseable bodies count as not affiliated"""
+        try:
+            data = response.json()
+            logger.info(f"Received valid JSON response: {data}")
+            return ValidationResult.from_affiliation(data)
+        except (ValueError, KeyError, AttributeError) as e:
+            logger.error(f"Failed to parse JSON response: {e}")
+            return ValidationResult(ValidationResult.AFFILIATION, message=f"Failed to parse API response: {e}") 
\ No newline at end of file
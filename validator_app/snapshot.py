@@ -0,0 +1,207 @@
+import atexit
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+import requests
+from django.conf import settings
+from .results import ValidationResult
+from .services import ExnessApiClient
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 4
+
+_snapshot_lock = threading.Lock()
+_snapshot_thread = None
+
+
+def _fernet():
+    """Build the cipher from EXNESS_SNAPSHOT_KEY, or derive one from SECRET_KEY"""
+    key = settings.EXNESS_SNAPSHOT_KEY
+    if not key:
+        digest = hashlib.sha256(f"exness-snapshot:{settings.SECRET_KEY}".encode()).digest()
+        key = base64.urlsafe_b64encode(digest)
+    return Fernet(key)
+
+
+def _serialize_cookies(cookies):
+    """Flatten a cookie jar (or the dict Selenium returns) into a plain dict"""
+    if not cookies:
+        return None
+    if isinstance(cookies, requests.cookies.RequestsCookieJar):
+        return requests.utils.dict_from_cookiejar(cookies)
+    return dict(cookies)
+
+
+def _serialize_token(token_cache):
+    """Turn a token cache dict into JSON-able values"""
+    expires_at = token_cache.get('expires_at')
+    return {
+        'token': token_cache.get('token'),
+        'expires_at': expires_at.isoformat() if expires_at else None,
+        'cookies': _serialize_cookies(token_cache.get('cookies')),
+    }
+
+
+def _restore_token(token_cache, token):
+    """Copy a saved token into an empty token cache if it hasn't expired"""
+    if not token.get('token') or not token.get('expires_at') or token_cache['token']:
+        return False
+    expires_at = datetime.fromisoformat(token['expires_at'])
+    if datetime.now() >= expires_at:
+        return False
+    token_cache['token'] = token['token']
+    token_cache['expires_at'] = expires_at
+    token_cache['cookies'] = token.get('cookies')
+    return True
+
+
+def build_snapshot():
+    """Capture every account's token and cookies plus fresh lookup results as a JSON-able dict"""
+    now = time.time()
+    
+    with ExnessApiClient._result_lock:
+        results = [
+            [list(key), entry_expires_at, result.to_list()]
+            for key, (entry_expires_at, result) in ExnessApiClient.RESULT_CACHE.items()
+            if entry_expires_at > now
+        ]
+    
+    return {
+        'version': SNAPSHOT_VERSION,
+        'saved_at': now,
+        'tokens': {
+            account.email: _serialize_token(account.token_cache)
+            for account in ExnessApiClient.account_pool().accounts
+        },
+        'results': results,
+    }
+
+
+def restore_snapshot(snapshot):
+    """Load a snapshot dict into ExnessApiClient, skipping anything already expired"""
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring snapshot with unsupported version {snapshot.get('version')}")
+        return False
+    
+    tokens = snapshot.get('tokens') or {}
+    restored_tokens = 0
+    for account in ExnessApiClient.account_pool().accounts:
+        if account.email in tokens and _restore_token(account.token_cache, tokens[account.email]):
+            restored_tokens += 1
+    
+    now = time.time()
+    restored_results = 0
+    for key, expires_at, result in snapshot.get('results', []):
+        if expires_at > now:
+            try:
+                result = ValidationResult.from_list(result)
+            except (ValueError, TypeError):
+                continue
+            ExnessApiClient.cache_result(tuple(key), result, expires_at=expires_at)
+            restored_results += 1
+    
+    logger.info(
+        f"Restored snapshot from {datetime.fromtimestamp(snapshot.get('saved_at', 0)).isoformat()}: "
+        f"{restored_tokens} token(s), {restored_results} cached results"
+    )
+    return restored_tokens > 0
+
+
+def save_snapshot(path=None):
+    """Encrypt the current state and atomically replace the snapshot file"""
+    path = path or settings.EXNESS_SNAPSHOT_PATH
+    if not path or Fernet is None:
+        return False
+    
+    snapshot = build_snapshot()
+    # Don't let a cold worker overwrite a warm snapshot with nothing
+    if not any(token['token'] for token in snapshot['tokens'].values()) and not snapshot['results']:
+        return False
+    
+    payload = _fernet().encrypt(json.dumps(snapshot, default=str).encode())
+    directory = os.path.dirname(os.path.abspath(path))
+    
+    with _snapshot_lock:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+            try:
+                with os.fdopen(fd, 'wb') as tmp:
+                    tmp.write(payload)
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Failed to write snapshot to {path}: {e}")
+            return False
+    
+    logger.debug(f"Saved snapshot to {path}")
+    return True
+
+
+def load_snapshot(path=None):
+    """Decrypt and restore the snapshot file if it exists"""
+    path = path or settings.EXNESS_SNAPSHOT_PATH
+    if not path or Fernet is None or not os.path.exists(path):
+        return False
+    
+    try:
+        with open(path, 'rb') as f:
+            snapshot = json.loads(_fernet().decrypt(f.read()))
+        return restore_snapshot(snapshot)
+    except (OSError, ValueError, InvalidToken) as e:
+        logger.warning(f"Failed to load snapshot from {path}: {e}")
+        return False
+
+
+def _snapshot_loop(interval):
+    """Save the snapshot every `interval` seconds"""
+    while True:
+        time.sleep(interval)
+        try:
+            save_snapshot()
+        except Exception as e:
+            logger.error(f"Periodic snapshot failed: {e}")
+
+
+def start_snapshots():
+    """
+    Restore the last snapshot at worker boot, then keep it up to date.
+    
+    The snapshot is rewritten every EXNESS_SNAPSHOT_INTERVAL seconds and once
+    more when the worker exits gracefully. Does nothing unless
+    EXNESS_SNAPSHOT_PATH is set.
+    """
+    global _snapshot_thread
+    
+    if not settings.EXNESS_SNAPSHOT_PATH:
+        return
+    if Fernet is None:
+        logger.warning("EXNESS_SNAPSHOT_PATH is set but the cryptography package is not installed; snapshots disabled")
+        return
+    if _snapshot_thread is not None:
+        return
+    
+    load_snapshot()
+    
+    _snapshot_thread = threading.Thread(
+        target=_snapshot_loop,
+        args=(settings.EXNESS_SNAPSHOT_INTERVAL,),
+        name='exness-snapshot',
+        daemon=True
+    )
+    _snapshot_thread.start()
+    atexit.register(save_snapshot)
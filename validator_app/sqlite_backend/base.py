@@ -0,0 +1,33 @@
+"""
+SQLite backend for running several gunicorn workers against one database file.
+
+Extra OPTIONS understood on top of the stock backend:
+    journal_mode, synchronous: applied as PRAGMAs on every new connection
+    transaction_mode: 'IMMEDIATE' takes the write lock when a transaction starts,
+        so concurrent writers wait for the busy timeout instead of failing with
+        "database is locked" when a read lock cannot be upgraded
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMA_OPTIONS = ('journal_mode', 'synchronous')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = [(name, params.pop(name)) for name in PRAGMA_OPTIONS if name in params]
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+    
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+    
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
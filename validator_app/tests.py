@@ -0,0 +1,765 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from . import jobs
+from . import exports
+from .accounts import AccountPool, AffiliateAccount
+from .middleware import ProfilingMiddleware
+from .models import ClientValidation, ValidationJob
+from .results import ValidationResult
+from .revalidation import due_clients, revalidate_batch
+from .services import ExnessApiClient
+from .snapshot import build_snapshot, restore_snapshot
+from .throttling import check_request, client_ip
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None):
+        self.status_code = status_code
+        self._data = data or {}
+        self.headers = {}
+        self.text = ''
+    
+    def json(self):
+        return self._data
+
+
+class HtmlResponse(FakeResponse):
+    def __init__(self):
+        super().__init__(200)
+        self.text = '<html>Checking your browser</html>'
+    
+    def json(self):
+        raise requests.exceptions.JSONDecodeError('Expecting value', self.text, 0)
+
+
+def report_api(registered, multi_value=True):
+    """Fake _api_get for /reports/clients/ answering from a set of registered accounts"""
+    calls = []
+    
+    def api_get(session, url, account, headers=None, **kwargs):
+        calls.append(url)
+        requested = [value for values in parse_qs(urlparse(url).query)['client_account'] for value in values.split(',')]
+        if len(requested) > 1 and not multi_value:
+            # An API that reads '1,2,3' as one literal account number finds nothing
+            return FakeResponse(200, {'data': []})
+        return FakeResponse(200, {'data': [{'client_account': int(account_id)} for account_id in requested if account_id in registered]})
+    
+    return api_get, calls
+
+
+@override_settings(EXNESS_BATCH_WINDOW_MS=20, EXNESS_BATCH_MAX_SIZE=20, EXNESS_RESULT_CACHE_TTL=0, EXNESS_HEDGE_MODE='off')
+class BatchedLookupTests(SimpleTestCase):
+
+    def setUp(self):
+        ExnessApiClient._batcher = None
+        ExnessApiClient._batch_filter_trusted = None
+        ExnessApiClient.RESULT_CACHE.clear()
+        patcher = mock.patch.object(ExnessApiClient, 'get_auth_token', return_value='token')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def lookup_concurrently(self, client_ids):
+        results = {}
+        
+        def lookup(client_id):
+            results[client_id] = ExnessApiClient.check_client_registration(client_id=client_id)
+        
+        threads = [threading.Thread(target=lookup, args=(client_id,)) for client_id in client_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def test_rows_are_routed_to_their_callers(self):
+        client_ids = [str(100000 + i) for i in range(20)]
+        registered = set(client_ids[::2])
+        api_get, calls = report_api(registered)
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            results = ExnessApiClient.lookup_registrations(client_ids[::2])
+        
+        self.assertEqual(len(calls), 1)
+        for client_id, result in results.items():
+            self.assertTrue(result.is_registered)
+            self.assertEqual(result.client_account, client_id)
+    
+    def test_missing_accounts_are_rechecked_not_reported_unregistered(self):
+        client_ids = [str(200000 + i) for i in range(5)]
+        api_get, calls = report_api(set(client_ids), multi_value=False)
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            results = self.lookup_concurrently(client_ids)
+        
+        for client_id in client_ids:
+            self.assertTrue(results[client_id].is_registered, client_id)
+            self.assertEqual(results[client_id].client_account, client_id)
+        # One batched call plus one single lookup per account it missed
+        self.assertEqual(len(calls), 1 + len(client_ids))
+        # The re-checks found registered accounts the reply left out
+        self.assertIs(ExnessApiClient._batch_filter_trusted, False)
+    
+    def test_unproven_filter_rechecks_missing_accounts_concurrently(self):
+        client_ids = ['300001', '300002', '300003']
+        api_get, calls = report_api({'300002'})
+        threads = set()
+        
+        def tracking_api_get(*args, **kwargs):
+            threads.add(threading.current_thread().name)
+            return api_get(*args, **kwargs)
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=tracking_api_get):
+            results = ExnessApiClient.lookup_registrations(client_ids)
+        
+        self.assertEqual({client_id: result.is_registered for client_id, result in results.items()},
+                         {'300001': False, '300002': True, '300003': False})
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(any(name.startswith('exness-batch') for name in threads), threads)
+        self.assertIsNone(ExnessApiClient._batch_filter_trusted)
+    
+    def test_missing_accounts_are_unregistered_once_filter_is_proven(self):
+        api_get, calls = report_api({'500001', '500002'})
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            first = ExnessApiClient.lookup_registrations(['500001', '500002', '500003'])
+            second = ExnessApiClient.resolve_registrations([str(600000 + i) for i in range(20)])
+        
+        self.assertFalse(first['500003'].is_registered)
+        self.assertIsNone(first['500003'].error)
+        self.assertEqual(second[1], 1)
+        self.assertFalse(any(result.is_registered for result in second[0].values()))
+        # One call per batch: nothing was re-checked individually
+        self.assertEqual(len(calls), 2)
+    
+    @override_settings(EXNESS_BATCH_TRUST_MISSING='never')
+    def test_trust_can_be_disabled(self):
+        api_get, calls = report_api({'700001', '700002'})
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            results, upstream_calls = ExnessApiClient.resolve_registrations(['700001', '700002', '700003'])
+        
+        self.assertFalse(results['700003'].is_registered)
+        self.assertEqual(upstream_calls, 2)
+        self.assertEqual(len(calls), 2)
+    
+    @override_settings(EXNESS_BATCH_TRUST_MISSING='always')
+    def test_trust_can_be_assumed(self):
+        api_get, calls = report_api(set())
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            results, upstream_calls = ExnessApiClient.resolve_registrations(['800001', '800002'])
+        
+        self.assertFalse(any(result.is_registered for result in results.values()))
+        self.assertEqual(upstream_calls, 1)
+    
+    def test_ignored_filter_falls_back_to_single_lookups(self):
+        client_ids = ['400001', '400002']
+        
+        def api_get(session, url, account, headers=None, **kwargs):
+            # Filter ignored: the reply lists some other client
+            if ',' in url:
+                return FakeResponse(200, {'data': [{'client_account': 999999}]})
+            return FakeResponse(200, {'data': [{'client_account': int(url.rsplit('=', 1)[1])}]})
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            results = ExnessApiClient.lookup_registrations(client_ids)
+        
+        self.assertTrue(all(result.is_registered for result in results.values()))
+
+
+@override_settings(THROTTLE_IP_RATE='2/m', THROTTLE_SESSION_RATE='', THROTTLE_CACHE_ALIAS='default')
+class ThrottleKeyingTests(SimpleTestCase):
+    
+    def setUp(self):
+        caches['default'].clear()
+        self.factory = RequestFactory()
+    
+    def forwarded_request(self, client):
+        # The router appends the visitor's address; REMOTE_ADDR is the router itself
+        return self.factory.post('/', HTTP_X_FORWARDED_FOR=f"203.0.113.9, {client}", REMOTE_ADDR='10.0.0.1')
+    
+    @override_settings(THROTTLE_TRUSTED_PROXIES=1)
+    def test_forwarded_clients_get_separate_buckets(self):
+        self.assertEqual(client_ip(self.forwarded_request('198.51.100.1')), '198.51.100.1')
+        
+        for _ in range(2):
+            self.assertEqual(check_request(self.forwarded_request('198.51.100.1')), 0)
+        self.assertGreater(check_request(self.forwarded_request('198.51.100.1')), 0)
+        
+        # A different visitor behind the same router still gets in
+        self.assertEqual(check_request(self.forwarded_request('198.51.100.2')), 0)
+    
+    @override_settings(THROTTLE_CLIENT_IP_HEADER='DO-Connecting-IP', THROTTLE_TRUSTED_PROXIES=0)
+    def test_platform_client_ip_header(self):
+        first = self.factory.post('/', HTTP_DO_CONNECTING_IP='198.51.100.7', REMOTE_ADDR='10.0.0.1')
+        second = self.factory.post('/', HTTP_DO_CONNECTING_IP='198.51.100.8', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ip(first), '198.51.100.7')
+        
+        for _ in range(2):
+            self.assertEqual(check_request(first), 0)
+        self.assertGreater(check_request(first), 0)
+        self.assertEqual(check_request(second), 0)
+    
+    @override_settings(THROTTLE_TRUSTED_PROXIES=1)
+    def test_spoofed_hops_left_of_the_proxy_are_ignored(self):
+        request = self.factory.post('/', HTTP_X_FORWARDED_FOR='1.2.3.4, 198.51.100.3', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ip(request), '198.51.100.3')
+
+
+class AccountPoolTests(SimpleTestCase):
+    
+    def setUp(self):
+        self.first = AffiliateAccount('first@example.com', 'secret')
+        self.second = AffiliateAccount('second@example.com', 'secret')
+        self.pool = AccountPool([self.first, self.second], eject_seconds=300, max_failures=2)
+    
+    def test_repeated_failures_eject_until_cooldown_passes(self):
+        self.pool.record_failure(self.first, "HTTP 502")
+        self.assertTrue(self.first.is_healthy())
+        self.pool.record_failure(self.first, "HTTP 502")
+        self.assertFalse(self.first.is_healthy())
+        
+        for _ in range(4):
+            with self.pool.lease() as account:
+                self.assertIs(account, self.second)
+        
+        # Back in rotation once the cooldown has passed
+        self.first.ejected_until = time.time() - 1
+        leased = set()
+        for _ in range(4):
+            with self.pool.lease() as account:
+                leased.add(account)
+        self.assertEqual(leased, {self.first, self.second})
+    
+    def test_success_resets_the_failure_streak(self):
+        self.pool.record_failure(self.first, "HTTP 502")
+        self.pool.record_success(self.first)
+        self.pool.record_failure(self.first, "HTTP 502")
+        self.assertTrue(self.first.is_healthy())
+    
+    def test_all_ejected_still_probes_the_soonest_back(self):
+        self.pool.eject(self.first, "throttled (429)", 600)
+        self.pool.eject(self.second, "throttled (429)", 60)
+        with self.pool.lease() as account:
+            self.assertIs(account, self.second)
+
+
+class TokenWarmupTests(SimpleTestCase):
+    
+    def setUp(self):
+        self.account = AffiliateAccount('warm@example.com', 'secret')
+        self.pool = AccountPool([self.account], eject_seconds=300)
+        patcher = mock.patch.object(ExnessApiClient, 'account_pool', return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_warmup_retries_an_account_ejected_for_a_failed_login(self):
+        def login(account):
+            account.token_cache['token'] = 'token'
+            account.token_cache['expires_at'] = datetime.now() + ExnessApiClient.TOKEN_LIFETIME
+            return 'token'
+        
+        with mock.patch.object(ExnessApiClient, '_login', return_value=None):
+            self.assertIsNone(ExnessApiClient.get_auth_token(self.account))
+        self.assertFalse(self.account.is_healthy())
+        
+        with mock.patch.object(ExnessApiClient, '_login', return_value=None):
+            self.assertEqual(ExnessApiClient.warm_tokens(), 0)
+        self.assertFalse(self.account.is_healthy())
+        
+        with mock.patch.object(ExnessApiClient, '_login', side_effect=login):
+            self.assertEqual(ExnessApiClient.warm_tokens(), 1)
+        self.assertTrue(self.account.is_healthy())
+        self.assertIsNotNone(ExnessApiClient.token_age(self.account))
+    
+    def test_warmup_keeps_throttled_accounts_ejected(self):
+        self.account.token_cache['token'] = 'token'
+        self.account.token_cache['expires_at'] = datetime.now() + ExnessApiClient.TOKEN_LIFETIME
+        self.pool.eject(self.account, "throttled (429)")
+        
+        self.assertEqual(ExnessApiClient.warm_tokens(), 1)
+        self.assertFalse(self.account.is_healthy())
+
+
+@override_settings(EXNESS_HEDGE_MODE='delayed', EXNESS_HEDGE_DELAY_MS=20, EXNESS_API_TIMEOUT=30, EXNESS_HEDGE_ATTEMPT_TIMEOUT=2)
+class HedgedLookupTests(SimpleTestCase):
+    
+    def setUp(self):
+        self.account = AffiliateAccount('hedge@example.com', 'secret')
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown, wait=True)
+        for target, value in (('_get_hedge_executor', self.executor), ('_record_hedge', None)):
+            patcher = mock.patch.object(ExnessApiClient, target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_slow_v1_is_hedged_with_a_bounded_read_timeout(self):
+        timeouts = []
+        
+        def api_get(session, url, account, headers=None, timeout=None):
+            timeouts.append(timeout)
+            if url.startswith(ExnessApiClient.BASE_URL_V2):
+                return FakeResponse(200)
+            time.sleep(0.2)
+            return FakeResponse(200)
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            base_url, response, payload = ExnessApiClient._hedged_get('/reports/clients/?client_account=1', {}, self.account)
+        
+        self.assertEqual(base_url, ExnessApiClient.BASE_URL_V2)
+        self.assertEqual(ExnessApiClient._record_hedge.call_args[0], (True, ExnessApiClient.BASE_URL_V2))
+        self.assertTrue(all(timeout == (30, 2) for timeout in timeouts), timeouts)
+    
+    def test_lookup_queued_behind_busy_threads_is_not_hedged(self):
+        # Occupy every pool thread for longer than the hedge delay
+        for _ in range(2):
+            self.executor.submit(time.sleep, 0.1)
+        urls = []
+        
+        def api_get(session, url, account, headers=None, timeout=None):
+            urls.append(url)
+            return FakeResponse(200)
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            base_url, response, payload = ExnessApiClient._hedged_get('/reports/clients/?client_account=1', {}, self.account)
+        
+        self.assertEqual(base_url, ExnessApiClient.BASE_URL_V1)
+        self.assertEqual(len(urls), 1)
+        self.assertEqual(ExnessApiClient._record_hedge.call_args[0], (False, ExnessApiClient.BASE_URL_V1))
+    
+    @override_settings(EXNESS_HEDGE_MODE='parallel')
+    def test_parallel_mode_submits_both_at_once_without_spinning(self):
+        for _ in range(2):
+            self.executor.submit(time.sleep, 0.2)
+        urls = []
+        
+        def api_get(session, url, account, headers=None, timeout=None):
+            urls.append(url)
+            return FakeResponse(200)
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get), \
+                mock.patch('validator_app.services.wait', side_effect=wait) as waits:
+            ExnessApiClient._hedged_get('/reports/clients/?client_account=1', {}, self.account)
+        
+        self.assertLessEqual(waits.call_count, 2)
+        self.assertTrue(all(call.kwargs['timeout'] is None for call in waits.call_args_list))
+        self.assertEqual(ExnessApiClient._record_hedge.call_args[0][0], True)
+    
+    def test_unparseable_200_loses_to_a_valid_answer(self):
+        def api_get(session, url, account, headers=None, timeout=None):
+            if url.startswith(ExnessApiClient.BASE_URL_V2):
+                return FakeResponse(200, {'data': [{'client_account': 1}]})
+            # A WAF challenge page served with status 200
+            return HtmlResponse()
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get), \
+                mock.patch.object(ExnessApiClient, 'get_auth_token', return_value='token'):
+            result = ExnessApiClient._fetch_client_registration(client_id='1', account=self.account)
+        
+        self.assertTrue(result.is_registered)
+        self.assertEqual(ExnessApiClient._record_hedge.call_args[0], (False, ExnessApiClient.BASE_URL_V2))
+    
+    def test_unparseable_200_alone_is_a_failure_not_an_exception(self):
+        with mock.patch.object(ExnessApiClient, '_api_get', return_value=HtmlResponse()), \
+                mock.patch.object(ExnessApiClient, 'get_auth_token', return_value='token'):
+            result = ExnessApiClient._fetch_client_registration(client_id='1', account=self.account)
+        
+        self.assertFalse(result.is_registered)
+        self.assertTrue(result.error)
+
+
+class HedgeStatsTests(SimpleTestCase):
+    
+    def setUp(self):
+        patcher = mock.patch.object(ExnessApiClient, 'HEDGE_STATS', dict.fromkeys(ExnessApiClient.HEDGE_STATS, 0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_fallback_wins_do_not_count_as_hedge_wins(self):
+        for _ in range(10):
+            ExnessApiClient._record_hedge(False, ExnessApiClient.BASE_URL_V2)
+        ExnessApiClient._record_hedge(True, ExnessApiClient.BASE_URL_V2)
+        ExnessApiClient._record_hedge(True, ExnessApiClient.BASE_URL_V1)
+        
+        stats = ExnessApiClient.get_hedge_stats()
+        self.assertEqual(stats['v2_wins'], 11)
+        self.assertEqual(stats['hedge_wins'], 1)
+        self.assertEqual(stats['hedge_win_rate'], 0.5)
+
+
+@override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_SECRET='s3cret')
+class ProfilingMiddlewareTests(SimpleTestCase):
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        with mock.patch('os.makedirs'):
+            self.middleware = ProfilingMiddleware(lambda request: HttpResponse('ok'))
+    
+    def test_non_ascii_header_is_not_profiled(self):
+        request = self.factory.get('/', HTTP_X_PROFILE='café')
+        self.assertFalse(self.middleware.should_profile(request))
+    
+    def test_matching_secret_is_profiled(self):
+        request = self.factory.get('/', HTTP_X_PROFILE='s3cret')
+        self.assertTrue(self.middleware.should_profile(request))
+
+
+@override_settings(EXNESS_CONDITIONAL_CACHE_BYTES=250)
+class ConditionalCacheTests(SimpleTestCase):
+    
+    def setUp(self):
+        self.account = AffiliateAccount('cache@example.com', 'secret')
+        for target, value in (('CONDITIONAL_CACHE', OrderedDict()), ('_conditional_bytes', 0)):
+            patcher = mock.patch.object(ExnessApiClient, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def get(self, url, size=100):
+        response = FakeResponse(200)
+        response.headers = {'ETag': f'"{url}"'}
+        response.content = b'x' * size
+        response.raw = None
+        response.encoding = 'utf-8'
+        session = mock.Mock()
+        session.get.return_value = response
+        return ExnessApiClient._api_get(session, url, self.account)
+    
+    def test_stored_bodies_are_bounded_by_total_bytes(self):
+        for index in range(5):
+            self.get(f'https://example.com/{index}')
+        
+        stats = ExnessApiClient.get_transfer_stats()
+        self.assertEqual(stats['cached_entries'], 2)
+        self.assertEqual(stats['cached_bytes'], 200)
+        self.assertEqual(list(ExnessApiClient.CONDITIONAL_CACHE), [(self.account.email, 'https://example.com/3'), (self.account.email, 'https://example.com/4')])
+    
+    def test_refreshing_an_entry_does_not_double_count(self):
+        self.get('https://example.com/a')
+        self.get('https://example.com/a', size=50)
+        self.assertEqual(ExnessApiClient.get_transfer_stats()['cached_bytes'], 50)
+    
+    def test_bodies_over_the_cap_are_not_stored(self):
+        self.get('https://example.com/big', size=300)
+        self.assertEqual(ExnessApiClient.get_transfer_stats()['cached_entries'], 0)
+
+
+class ExportPagingTests(TestCase):
+    def test_pages_cover_every_row_once_in_pk_order(self):
+        ClientValidation.objects.bulk_create(
+            ClientValidation(client_id=str(n), is_registered=n % 2 == 0) for n in range(7)
+        )
+        
+        with mock.patch.object(exports, 'EXPORT_CHUNK_SIZE', 3), self.assertNumQueries(3):
+            rows = list(exports._iter_rows(exports.filter_validations()))
+        
+        self.assertEqual([row[1] for row in rows], [str(n) for n in range(7)])
+    
+    def test_filters_apply_to_every_page(self):
+        ClientValidation.objects.bulk_create(
+            ClientValidation(client_id=str(n), is_registered=n % 2 == 0) for n in range(7)
+        )
+        
+        with mock.patch.object(exports, 'EXPORT_CHUNK_SIZE', 2):
+            lines = ''.join(exports.iter_csv(exports.filter_validations(is_registered='true'))).splitlines()
+        
+        self.assertEqual(len(lines), 1 + 4)
+
+
+class ValidationResultSerializationTests(SimpleTestCase):
+    RESULTS = (
+        ValidationResult.from_registration({'data': [{
+            'client_account': 12345678,
+            'client_account_type': 'Standard',
+            'reg_date': '2025-01-31',
+            'volume_lots': '1.25',
+            'volume_mln_usd': 0.5,
+            'reward': '3.10',
+            'reward_usd': 3.1,
+        }]}),
+        ValidationResult.from_affiliation({'is_affiliated': 'true', 'link_code': 'abc', 'accounts': [1, 2]}),
+        ValidationResult(ValidationResult.REGISTRATION),
+        ValidationResult.failure("Сбой API: 503"),
+    )
+    
+    def assertSameResult(self, restored, result):
+        self.assertIsInstance(restored, ValidationResult)
+        for name in ValidationResult.__slots__:
+            self.assertEqual(getattr(restored, name), getattr(result, name), name)
+            self.assertIs(type(getattr(restored, name)), type(getattr(result, name)), name)
+    
+    def test_bytes_round_trip(self):
+        for result in self.RESULTS:
+            with self.subTest(result=result):
+                self.assertSameResult(ValidationResult.from_bytes(result.to_bytes()), result)
+    
+    def test_bytes_reject_other_versions_and_damage(self):
+        data = self.RESULTS[0].to_bytes()
+        
+        for damaged in (bytes([ValidationResult.VERSION + 1]) + data[1:], data[:-1], data + b'x', b''):
+            with self.subTest(damaged=damaged[:8]):
+                with self.assertRaises(ValueError):
+                    ValidationResult.from_bytes(damaged)
+    
+    def test_json_round_trip(self):
+        for result in self.RESULTS:
+            with self.subTest(result=result):
+                restored = ValidationResult.from_list(json.loads(json.dumps(result.to_list())))
+                self.assertSameResult(restored, result)
+    
+    def test_snapshot_restores_cached_results(self):
+        result = self.RESULTS[1]
+        expires_at = time.time() + 60
+        with mock.patch.object(ExnessApiClient, 'RESULT_CACHE', OrderedDict()):
+            ExnessApiClient.cache_result(('affiliation', '1'), result, expires_at=expires_at)
+            snapshot = json.loads(json.dumps(build_snapshot(), default=str))
+            ExnessApiClient.RESULT_CACHE.clear()
+            
+            restore_snapshot(snapshot)
+            
+            restored_expires_at, restored = ExnessApiClient.RESULT_CACHE[('affiliation', '1')]
+        self.assertEqual(restored_expires_at, expires_at)
+        self.assertSameResult(restored, result)
+
+
+@override_settings(EXNESS_BATCH_WINDOW_MS=20, EXNESS_BATCH_MAX_SIZE=20, EXNESS_RESULT_CACHE_TTL=0, EXNESS_HEDGE_MODE='off')
+class RevalidationTests(TestCase):
+    
+    def setUp(self):
+        ExnessApiClient._batch_filter_trusted = None
+        patcher = mock.patch.object(ExnessApiClient, 'get_auth_token', return_value='token')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def create_clients(self, count, **fields):
+        return ClientValidation.objects.bulk_create(
+            ClientValidation(client_id=str(900000 + n), client_account=str(900000 + n), is_registered=True, **fields)
+            for n in range(count)
+        )
+    
+    def test_fallback_lookups_count_against_the_budget(self):
+        self.create_clients(30)
+        # The API reads '1,2,3' as one account, so every batch falls back to single lookups
+        api_get, calls = report_api({str(900000 + n) for n in range(30)}, multi_value=False)
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            stats = revalidate_batch(10)
+        
+        self.assertEqual(stats['upstream_calls'], len(calls))
+        self.assertLessEqual(len(calls), 10)
+        self.assertEqual(stats['checked'], 9)
+    
+    def test_rate_paces_every_upstream_call(self):
+        self.create_clients(5)
+        api_get, calls = report_api({str(900000 + n) for n in range(5)}, multi_value=False)
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get), \
+                mock.patch('validator_app.revalidation.time.sleep') as sleep:
+            revalidate_batch(50, rate=2)
+        
+        # One batched query plus five single lookups at 2 calls/s
+        self.assertEqual(len(calls), 6)
+        self.assertAlmostEqual(sleep.call_args[0][0], 3.0, places=1)
+    
+    def test_due_clients_puts_hot_clients_first_then_changed_then_stalest(self):
+        now = timezone.now()
+        
+        def client(name, **fields):
+            return ClientValidation.objects.create(client_id=name, client_account=name, is_registered=True, **fields)
+        
+        hot_recent = client('hot-recent', last_requested_at=now - timedelta(hours=1))
+        hot_older = client('hot-older', last_requested_at=now - timedelta(days=2), last_checked_at=now - timedelta(hours=2))
+        client('hot-fresh', last_requested_at=now - timedelta(hours=1), last_checked_at=now - timedelta(minutes=10))
+        cold_changed = client('cold-changed', last_checked_at=now - timedelta(days=2), last_changed_at=now - timedelta(days=1))
+        cold_stale = client('cold-stale', last_checked_at=now - timedelta(days=3))
+        cold_never = client('cold-never')
+        client('cold-fresh', last_checked_at=now - timedelta(hours=1))
+        ClientValidation.objects.create(client_id='unregistered', is_registered=False)
+        
+        hot, cold = due_clients(now)
+        
+        self.assertEqual(list(hot), [hot_recent, hot_older])
+        self.assertEqual(list(cold), [cold_changed, cold_never, cold_stale])
+    
+    @override_settings(EXNESS_BATCH_TRUST_MISSING='never')
+    def test_changed_clients_are_updated_and_the_rest_only_stamped(self):
+        rows = {
+            '910001': {'client_account': 910001, 'client_account_type': 'Standard', 'reg_date': '2025-01-31',
+                       'volume_lots': 1.5, 'volume_mln_usd': 0.1, 'reward': '2.50', 'reward_usd': '2.50'},
+            '910002': {'client_account': 910002, 'client_account_type': 'Pro', 'reg_date': '2025-02-01',
+                       'volume_lots': 4.0, 'volume_mln_usd': 0.3, 'reward': '7.00', 'reward_usd': '7.00'},
+        }
+        for account, row in rows.items():
+            ClientValidation.objects.create(client_id=account, **ValidationResult.from_report_row(row).model_fields())
+        ClientValidation.objects.create(client_id='910003', client_account='910003', is_registered=True, volume_lots=3)
+        rows['910002'] = dict(rows['910002'], volume_lots=9.5, reward='11.00')
+        
+        def api_get(session, url, account, headers=None, **kwargs):
+            requested = parse_qs(urlparse(url).query)['client_account'][0].split(',')
+            if '910003' in requested and len(requested) == 1:
+                return FakeResponse(502)
+            return FakeResponse(200, {'data': [rows[account_id] for account_id in requested if account_id in rows]})
+        
+        with mock.patch.object(ExnessApiClient, '_api_get', side_effect=api_get):
+            stats = revalidate_batch(50)
+        
+        self.assertEqual((stats['checked'], stats['changed'], stats['unchanged'], stats['failed']), (3, 1, 1, 1))
+        unchanged, changed, failed = ClientValidation.objects.order_by('client_id')
+        
+        self.assertEqual(changed.volume_lots, 9.5)
+        self.assertEqual(str(changed.reward), '11.00')
+        self.assertIsNotNone(changed.last_changed_at)
+        self.assertEqual(changed.last_checked_at, changed.last_changed_at)
+        
+        # Unchanged and failed clients only get last_checked_at, so they move to the back of the queue
+        self.assertEqual(unchanged.volume_lots, 1.5)
+        self.assertIsNone(unchanged.last_changed_at)
+        self.assertIsNotNone(unchanged.last_checked_at)
+        self.assertEqual(failed.volume_lots, 3)
+        self.assertIsNone(failed.last_changed_at)
+        self.assertIsNotNone(failed.last_checked_at)
+        self.assertEqual(list(due_clients()[1]), [])
+
+class RecordingExecutor:
+    def __init__(self):
+        self.submitted = []
+    
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], SECURE_SSL_REDIRECT=False, VALIDATION_JOB_TIMEOUT=120)
+class ValidationJobTests(TestCase):
+    
+    def setUp(self):
+        # _run closes the thread's connections when it ends; keep the test's connection open
+        for target in ('close_old_connections', 'connections'):
+            patcher = mock.patch(f'validator_app.jobs.{target}')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_enqueue_records_a_pending_job_for_the_pool(self):
+        executor = RecordingExecutor()
+        with mock.patch.object(jobs, '_get_executor', return_value=executor):
+            job = jobs.enqueue(client_id='12345678')
+        
+        self.assertEqual(ValidationJob.objects.get(pk=job.pk).status, ValidationJob.STATUS_PENDING)
+        self.assertEqual(executor.submitted, [(jobs._run, (job.pk,))])
+    
+    def test_run_stores_a_successful_outcome(self):
+        job = ValidationJob.objects.create(client_id='12345678')
+        validation = ClientValidation.objects.create(client_id='12345678', is_registered=True)
+        outcome = {'is_registered': True, 'client_validation': validation}
+        
+        with mock.patch.object(jobs, 'validate_client', return_value=outcome) as validate:
+            jobs._run(job.pk)
+        
+        validate.assert_called_once_with(client_id='12345678', email=None)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ValidationJob.STATUS_DONE)
+        self.assertTrue(job.is_registered)
+        self.assertEqual(job.client_validation, validation)
+        self.assertIsNotNone(job.finished_at)
+    
+    def test_run_records_api_errors_and_crashes_as_failures(self):
+        for effect, expected in (
+            ({'error': "API request failed with status code: 502"}, "API request failed with status code: 502"),
+            (RuntimeError("boom"), "Unexpected error while checking the client: boom"),
+        ):
+            with self.subTest(expected=expected):
+                job = ValidationJob.objects.create(email='client@example.com')
+                side_effect = effect if isinstance(effect, Exception) else None
+                with mock.patch.object(jobs, 'validate_client', return_value=effect, side_effect=side_effect):
+                    jobs._run(job.pk)
+                
+                job.refresh_from_db()
+                self.assertEqual(job.status, ValidationJob.STATUS_FAILED)
+                self.assertEqual(job.error, expected)
+    
+    def test_unfinished_job_past_the_timeout_is_reported_failed(self):
+        job = ValidationJob.objects.create(client_id='12345678', status=ValidationJob.STATUS_RUNNING)
+        self.assertEqual(jobs.job_payload(job)['status'], ValidationJob.STATUS_RUNNING)
+        
+        ValidationJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(seconds=121))
+        job.refresh_from_db()
+        payload = jobs.job_payload(job)
+        
+        self.assertEqual(payload['status'], ValidationJob.STATUS_FAILED)
+        self.assertIn("timed out", payload['error'])
+    
+    def test_status_view_renders_finished_jobs(self):
+        job = ValidationJob.objects.create(client_id='12345678', status=ValidationJob.STATUS_DONE, is_registered=False)
+        
+        response = self.client.get(reverse('validator_app:job_status', args=[job.pk]))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], ValidationJob.STATUS_DONE)
+        self.assertIn('not-registered', response.json()['html'])
+        self.assertEqual(self.client.get(reverse('validator_app:job_status', args=[uuid.uuid4()])).status_code, 404)
+    
+    @override_settings(VALIDATION_JOBS=True, THROTTLE_CACHE_ALIAS='default')
+    def test_job_mode_post_returns_a_polling_url(self):
+        caches['default'].clear()
+        job = ValidationJob.objects.create(client_id='12345678')
+        
+        with mock.patch('validator_app.views.enqueue', return_value=job):
+            response = self.client.post(reverse('validator_app:validator'), {'client_id': '12345678'},
+                                        HTTP_ACCEPT='application/json')
+        
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status_url'], reverse('validator_app:job_status', args=[job.pk]))
+        # No streaming transport: it would hold a worker thread for the whole job
+        with self.assertRaises(NoReverseMatch):
+            reverse('validator_app:job_events', args=[job.pk])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], SECURE_SSL_REDIRECT=False, HEALTH_REQUIRE_TOKEN=True)
+class ReadinessTests(TestCase):
+    
+    def setUp(self):
+        account = AffiliateAccount('ready@example.com', 'secret')
+        account.last_error = "401 for https://internal.example/login"
+        pool = AccountPool([account])
+        for target, kwargs in (
+            ('validator_app.health.start_token_warmup', {}),
+            ('validator_app.health.ExnessApiClient.account_pool', {'return_value': pool}),
+            ('validator_app.health.ExnessApiClient.token_age', {'return_value': 42}),
+        ):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_public_report_only_has_status_token_age_and_circuit_state(self):
+        response = self.client.get(reverse('validator_app:readyz'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'status': 'ready',
+            'database': {'ok': True},
+            'tokens': {'warm': 1, 'total': 1, 'ages': [42]},
+            'upstream': {'state': 'closed'},
+        })
+        self.assertNotIn(b'internal.example', response.content)
+    
+    def test_staff_see_account_errors_and_transfer_stats(self):
+        staff = get_user_model().objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        
+        report = self.client.get(reverse('validator_app:readyz')).json()
+        
+        self.assertEqual(report['upstream']['accounts'][0]['last_error'], "401 for https://internal.example/login")
+        self.assertIn('transfer', report)
+        self.assertIsNone(report['database']['error'])
@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse a rate such as '20/m' into (limit, window_seconds).
+    
+    Returns None for an empty rate, which disables that limit.
+    """
+    if not rate:
+        return None
+    limit, _, period = rate.partition('/')
+    try:
+        return int(limit), RATE_PERIODS[period.strip().lower()[:1]]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate '{rate}', expected e.g. '20/m'")
+
+
+def _hit(scope, ident, rate):
+    """
+    Count one hit in a fixed window and report whether it is within `rate`.
+    
+    Returns:
+        int: 0 if allowed, otherwise seconds until the window resets
+    """
+    parsed = parse_rate(rate)
+    if parsed is None:
+        return 0
+    limit, window = parsed
+    
+    now = time.time()
+    window_start = int(now // window) * window
+    key = f"throttle:{scope}:{ident}:{window_start}"
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
+    
+    if cache.add(key, 1, timeout=window):
+        count = 1
+    else:
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(key, 1, timeout=window)
+            count = 1
+    
+    if count <= limit:
+        return 0
+    return max(1, int(window_start + window - now))
+
+
+def client_ip(request):
+    """
+    The caller's IP address.
+    
+    THROTTLE_CLIENT_IP_HEADER (a header the platform's router overwrites,
+    e.g. DO-Connecting-IP on App Platform) wins when present. Otherwise, with
+    THROTTLE_TRUSTED_PROXIES proxies in front of the app, the address that
+    many hops from the right of X-Forwarded-For is used; failing both, REMOTE_ADDR.
+    """
+    if settings.THROTTLE_CLIENT_IP_HEADER:
+        address = request.headers.get(settings.THROTTLE_CLIENT_IP_HEADER, '').strip()
+        if address:
+            return address
+    
+    proxies = settings.THROTTLE_TRUSTED_PROXIES
+    if proxies:
+        forwarded = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _session_ident(request):
+    """Identify the browser session without creating one (which would cost a DB write)"""
+    session = getattr(request, 'session', None)
+    ident = (session.session_key if session is not None else None) or request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if not ident:
+        return None
+    return hashlib.sha256(ident.encode()).hexdigest()[:32]
+
+
+def check_request(request):
+    """
+    Apply the per-IP and per-session limits to a validation request.
+    
+    Returns:
+        int: 0 if the request is admitted, otherwise a Retry-After in seconds
+    """
+    retry_after = _hit('ip', client_ip(request), settings.THROTTLE_IP_RATE)
+    if retry_after:
+        logger.warning(f"Throttled validation request from {client_ip(request)}")
+        return retry_after
+    
+    session_ident = _session_ident(request)
+    if session_ident:
+        retry_after = _hit('session', session_ident, settings.THROTTLE_SESSION_RATE)
+        if retry_after:
+            logger.warning(f"Throttled validation request for session {session_ident[:8]}")
+            return retry_after
+    
+    return 0
+
+
+def consume_upstream_budget():
+    """
+    Take one upstream lookup from the UPSTREAM_BUDGET window.
+    
+    Returns:
+        int: 0 if the lookup may go ahead, otherwise a Retry-After in seconds
+    """
+    retry_after = _hit('upstream', 'global', settings.UPSTREAM_BUDGET)
+    if retry_after:
+        logger.warning("Upstream budget exhausted, shedding validation request")
+    return retry_after
@@ -1,8 +1,12 @@
 from django.urls import path
-from .views import ClientValidatorView
+from .views import ClientValidatorView, ClientValidationExportView, ValidationJobStatusView, LivenessView, ReadinessView
 
 app_name = 'validator_app'
 
 urlpatterns = [
     path('', ClientValidatorView.as_view(), name='validator'),
+    path('export/', ClientValidationExportView.as_view(), name='export'),
+    path('jobs/<uuid:job_id>/', ValidationJobStatusView.as_view(), name='job_status'),
+    path('healthz/', LivenessView.as_view(), name='healthz'),
+    path('readyz/', ReadinessView.as_view(), name='readyz'),
 ] 
\ No newline at end of file
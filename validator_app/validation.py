@@ -0,0 +1,60 @@
+from django.utils import timezone
+from .services import ExnessApiClient
+from .models import ClientValidation
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def validate_client(client_id=None, email=None):
+    """
+    Check a client through the Exness API and record the outcome.
+    
+    Args:
+        client_id (str): MT4/5 account number, checked via the reports endpoint
+        email (str): Email address, checked via the affiliation endpoint
+        
+    Returns:
+        dict: {'error': message} if the API call failed, otherwise the template
+        context keys 'result', 'is_registered' and 'client_validation'
+    """
+    # Check client registration via the API
+    if client_id:
+        # Use check_client_registration for client IDs
+        result = ExnessApiClient.check_client_registration(client_id=client_id)
+    else:
+        # Use check_client_affiliation for emails - this uses the /api/v1/referral-agents/affiliation/ endpoint
+        result = ExnessApiClient.check_client_affiliation(email)
+    
+    # Handle API errors
+    if result.error:
+        return {'error': result.error}
+    
+    # Both lookups report registration/affiliation as is_registered
+    is_registered = result.is_registered
+    
+    # Collect results for template rendering
+    context = {'result': result, 'is_registered': is_registered}
+    now = timezone.now()
+    
+    # Store registered clients, and affiliated ones the API gave an account for
+    if is_registered and (result.kind == result.REGISTRATION or result.accounts):
+        fields = result.model_fields()
+        fields.update(last_checked_at=now, last_requested_at=now)
+        client_validation, created = ClientValidation.objects.update_or_create(
+            client_id=fields['client_account'] or client_id or email,
+            defaults=fields
+        )
+        
+        context['client_validation'] = client_validation
+    else:
+        # For non-registered clients, just record the fact they are not registered
+        client_validation = ClientValidation.objects.create(
+            client_id=client_id or email,
+            is_registered=False,
+            last_checked_at=now,
+            last_requested_at=now
+        )
+        context['client_validation'] = client_validation
+    
+    return context
@@ -1,10 +1,19 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.views import View
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
 from .forms import ClientValidationForm
+from .health import readiness
+from .exports import filter_validations, iter_export
+from .jobs import enqueue, job_payload
+from .models import ValidationJob
 from .services import ExnessApiClient
-from .models import ClientValidation
-from datetime import datetime
+from .throttling import check_request, consume_upstream_budget
+from .validation import validate_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,89 +21,125 @@ logger = logging.getLogger(__name__)
 class ClientValidatorView(View):
     template_name = 'validator_app/validator.html'
     
+    def get_context(self, form):
+        # The page script only switches to job mode when this is rendered
+        return {'form': form, 'validation_jobs': settings.VALIDATION_JOBS}
+    
+    def wants_job(self, request):
+        """Whether this POST came from the page script in job mode"""
+        return settings.VALIDATION_JOBS and 'application/json' in request.headers.get('Accept', '')
+    
     def get(self, request, *args, **kwargs):
         form = ClientValidationForm()
-        return render(request, self.template_name, {'form': form})
+        return render(request, self.template_name, self.get_context(form))
+    
+    def reject(self, request, form, message, status, retry_after):
+        """Render the form with an error without touching the API or the database"""
+        if self.wants_job(request):
+            response = JsonResponse({'error': message}, status=status)
+        else:
+            messages.error(request, message)
+            response = render(request, self.template_name, self.get_context(form), status=status)
+        response['Retry-After'] = str(retry_after)
+        return response
     
     def post(self, request, *args, **kwargs):
         form = ClientValidationForm(request.POST)
-        context = {'form': form}
+        context = self.get_context(form)
+        
+        # Shed abusive traffic before it can cost an upstream call or a DB write
+        retry_after = check_request(request)
+        if retry_after:
+            return self.reject(request, form, "Too many checks, please wait a moment and try again.", 429, retry_after)
         
         if form.is_valid():
             client_id = form.cleaned_data.get('client_id')
             email = form.cleaned_data.get('email')
             
-            # Check client registration via the API
-            if client_id:
-                # Use check_client_registration for client IDs
-                result = ExnessApiClient.check_client_registration(client_id=client_id)
-            else:
-                # Use check_client_affiliation for emails - this uses the /api/v1/referral-agents/affiliation/ endpoint
-                result = ExnessApiClient.check_client_affiliation(email)
+            # Cached results are free; anything else needs room in the upstream budget
+            cache_key = ('registration', client_id) if client_id else ('affiliation', email)
+            if ExnessApiClient.get_cached_result(cache_key) is None:
+                retry_after = consume_upstream_budget()
+                if retry_after:
+                    return self.reject(request, form, "The checker is busy right now, please try again in a minute.", 503, retry_after)
             
-            # Handle API errors
-            if 'error' in result:
-                messages.error(request, result['error'])
-                return render(request, self.template_name, context)
+            # Job mode: hand the lookup to a worker thread and answer straight away
+            if self.wants_job(request):
+                job = enqueue(client_id=client_id, email=email)
+                return JsonResponse({
+                    'id': str(job.pk),
+                    'status': job.status,
+                    'status_url': reverse('validator_app:job_status', args=[job.pk]),
+                }, status=202)
             
-            # Standardize the result structure for both methods
-            # check_client_registration returns is_registered
-            # check_client_affiliation returns is_affiliated
-            is_registered = result.get('is_registered', result.get('is_affiliated', False))
+            outcome = validate_client(client_id=client_id, email=email)
             
-            # Store results in context for template rendering
-            context['result'] = result
-            context['is_registered'] = is_registered
+            # Handle API errors
+            if 'error' in outcome:
+                messages.error(request, outcome['error'])
+                return render(request, self.template_name, context)
             
-            # If client is registered and has data, store it
-            if is_registered and result.get('client_data'):
-                client_data = result['client_data']
-                
-                # Parse registration date if available
-                reg_date = None
-                if client_data.get('reg_date'):
-                    try:
-                        reg_date = datetime.strptime(client_data['reg_date'], '%Y-%m-%d')
-                    except (ValueError, TypeError):
-                        logger.warning(f"Could not parse reg_date: {client_data.get('reg_date')}")
-                
-                # Create or update client validation record
-                client_validation, created = ClientValidation.objects.update_or_create(
-                    client_id=client_data.get('client_account', client_id or email),
-                    defaults={
-                        'is_registered': True,
-                        'reg_date': reg_date,
-                        'client_account': client_data.get('client_account', ''),
-                        'client_account_type': client_data.get('client_account_type', ''),
-                        'volume_lots': client_data.get('volume_lots', 0),
-                        'volume_mln_usd': client_data.get('volume_mln_usd', 0),
-                        'reward': client_data.get('reward', 0),
-                        'reward_usd': client_data.get('reward_usd', 0),
-                    }
-                )
-                
-                context['client_validation'] = client_validation
-            elif is_registered and result.get('accounts'):
-                # Handle the affiliation endpoint response structure which includes 'accounts'
-                accounts = result.get('accounts', [])
-                account_id = accounts[0] if accounts else email
-                
-                client_validation, created = ClientValidation.objects.update_or_create(
-                    client_id=account_id,
-                    defaults={
-                        'is_registered': True,
-                        'client_account': account_id,
-                        'client_account_type': 'Affiliated',  # Indicate this came from affiliation endpoint
-                    }
-                )
-                
-                context['client_validation'] = client_validation
-            else:
-                # For non-registered clients, just record the fact they are not registered
-                client_validation = ClientValidation.objects.create(
-                    client_id=client_id or email,
-                    is_registered=False
-                )
-                context['client_validation'] = client_validation
+            context.update(outcome)
+        elif self.wants_job(request):
+            errors = [error for field_errors in form.errors.values() for error in field_errors]
+            return JsonResponse({'error': ' '.join(errors)}, status=400)
+        
+        return render(request, self.template_name, context)
+
+
+class ValidationJobStatusView(View):
+    """Current state of a validation job, for polling"""
+    
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_object_or_404(ValidationJob, pk=job_id)
+        return JsonResponse(job_payload(job))
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class ClientValidationExportView(View):
+    """Stream validation history as CSV or JSON Lines for staff users"""
+    
+    content_types = {
+        'csv': 'text/csv; charset=utf-8',
+        'jsonl': 'application/x-ndjson; charset=utf-8',
+    }
+    
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in self.content_types:
+            return HttpResponseBadRequest(f"Unsupported export format '{export_format}'")
         
-        return render(request, self.template_name, context) 
\ No newline at end of file
+        try:
+            queryset = filter_validations(
+                since=request.GET.get('since'),
+                until=request.GET.get('until'),
+                is_registered=request.GET.get('is_registered'),
+                client_account_type=request.GET.get('client_account_type'),
+            )
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        
+        response = StreamingHttpResponse(
+            iter_export(queryset, export_format),
+            content_type=self.content_types[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="client_validations.{export_format}"'
+        return response
+
+
+class LivenessView(View):
+    """The process is up and serving requests"""
+    
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'status': 'ok'})
+
+
+class ReadinessView(View):
+    """Whether this worker is ready for traffic: database reachable and an affiliate token in hand"""
+    
+    def get(self, request, *args, **kwargs):
+        # Account errors and transfer counters are for staff only; probes get the summary
+        report = readiness(detailed=request.user.is_staff)
+        response = JsonResponse(report, status=200 if report['status'] == 'ready' else 503)
+        response['Cache-Control'] = 'no-store'
+        return response